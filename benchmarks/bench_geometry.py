@@ -0,0 +1,75 @@
+"""
+Benchmark the vectorized geometry stage against the per-symbol turtle path.
+
+Usage: python benchmarks/bench_geometry.py [iterations...]
+
+The turtle timings need a display; without one only the headless geometry
+stage is measured.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import geometry, lsystem, utils  # noqa: E402
+
+# Iterations giving each example roughly 10^4-10^5 segments
+DEFAULT_ITERATIONS = {
+    "dragon_curve": 15,
+    "fractal_plant": 6,
+    "koch_curve": 6,
+    "koch_triangle": 7,
+    "sierpinski": 8,
+    "tree": 12,
+}
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def turtle_screen():
+    """Return a turtle screen with tracing off, or None without a display"""
+    try:
+        import turtle
+        screen = turtle.Screen()
+        screen.setup(width=800, height=600)
+        screen.tracer(0)
+        return screen
+    except Exception:
+        return None
+
+
+def main(argv):
+    screen = turtle_screen()
+    if screen is None:
+        print("No display available: turtle timings skipped.\n")
+
+    print(f"{'system':<15}{'iter':>5}{'segments':>10}{'geometry s':>12}{'draw s':>10}{'reference s':>13}")
+    for filename in sorted(os.listdir(utils.get_examples_dir())):
+        name = os.path.splitext(filename)[0]
+        with open(os.path.join(utils.get_examples_dir(), filename)) as file:
+            lsys = lsystem.LSystem(json.load(file))
+        iterations = int(argv[0]) if argv else DEFAULT_ITERATIONS.get(name, 6)
+        instructions = lsys.generate(iterations)
+
+        segments, geometry_time = timed(geometry.compute_segments, lsys.lSystem, instructions)
+        draw_time = reference_time = float("nan")
+        if screen is not None:
+            import turtle
+            turtle.clearscreen()
+            screen.tracer(0)
+            _, draw_time = timed(lsys.draw, instructions)
+            turtle.clearscreen()
+            screen.tracer(0)
+            _, reference_time = timed(lsys.draw_reference, instructions)
+
+        print(f"{name:<15}{iterations:>5}{len(segments):>10}{geometry_time:>12.4f}{draw_time:>10.4f}{reference_time:>13.4f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
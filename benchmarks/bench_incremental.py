@@ -0,0 +1,58 @@
+"""
+Benchmark incremental multi-frame generation against regenerating every frame.
+
+Usage: python benchmarks/bench_incremental.py [max_iterations...]
+
+The animation path needs every generation from 1 to max_iterations. Calling
+generate(i) for each one redoes all earlier rewrites, while
+LSystem.iter_generations rewrites each generation from the previous one.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import lsystem, utils  # noqa: E402
+
+DEFAULT_MAX_ITERATIONS = (8, 9, 10)
+
+
+def regenerate_each(lsys, max_iterations):
+    return [lsys.generate(i) for i in range(1, max_iterations + 1)]
+
+
+def incremental(lsys, max_iterations):
+    return [instructions for _, instructions in lsys.iter_generations(max_iterations, start=1)]
+
+
+def best_of(function, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv):
+    max_iterations_list = [int(arg) for arg in argv] or DEFAULT_MAX_ITERATIONS
+    print(f"{'system':<15}{'iter':>5}{'symbols':>13}{'regenerate s':>14}{'incremental s':>15}{'speedup':>9}")
+    for filename in sorted(os.listdir(utils.get_examples_dir())):
+        name = os.path.splitext(filename)[0]
+        with open(os.path.join(utils.get_examples_dir(), filename)) as file:
+            lsys = lsystem.LSystem(json.load(file))
+        for max_iterations in max_iterations_list:
+            frames = incremental(lsys, max_iterations)
+            assert frames == regenerate_each(lsys, max_iterations)
+            symbols = sum(len(frame) for frame in frames)
+            del frames
+            regenerate_time = best_of(regenerate_each, lsys, max_iterations)
+            incremental_time = best_of(incremental, lsys, max_iterations)
+            print(f"{name:<15}{max_iterations:>5}{symbols:>13}{regenerate_time:>14.4f}"
+                  f"{incremental_time:>15.4f}{regenerate_time / incremental_time:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,123 @@
+"""
+Benchmark the startup of the interactive app.
+
+Usage: python benchmarks/bench_startup.py [--repeat N]
+
+Two numbers are measured, each best-of --repeat in fresh interpreters:
+
+    import       python -X importtime -c "import main": everything main.py loads
+                 before the first window exists
+    first frame  launch of a fresh interpreter until main.start() has drawn the
+                 turtle window and the control panel, then until the catalog
+                 finished loading in the background
+
+The first-frame timings need a display; without one only the imports are
+measured. Modules that should only load on first use (Pillow and the
+animation writer) are reported if the import pulls them in anyway.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the app must not import before they are needed
+LAZY_MODULES = ("PIL", "lsystem.gif", "lsystem.raster", "concurrent.futures.process")
+
+# Opens the app, then reports when its first frame is drawn and when the catalog has loaded
+FIRST_FRAME_SCRIPT = """
+import time
+import main
+screen, panel = main.start()
+print("first_frame", flush=True)
+while panel.catalog_task is None or not panel.catalog_task.finished:
+    screen.update()
+    time.sleep(0.001)
+print("catalog", len(panel.systems), flush=True)
+screen.getcanvas().winfo_toplevel().destroy()
+"""
+
+
+def parse_importtime(output: str) -> list:
+    """(nesting depth, cumulative microseconds, module) of every import in -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # Two more spaces per nesting level
+        imports.append((depth, int(cumulative), name.strip()))
+    return imports
+
+
+def measure_imports() -> dict:
+    """Import main.py in a fresh interpreter and time its imports, listing the heaviest modules main.py loads"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main, sys; print(' '.join(sys.modules))"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    imports = parse_importtime(result.stderr)
+    loaded = set(result.stdout.split())
+    # Children are reported before their parent, so main's own imports are the ones right above it
+    children = []
+    main_imports = []
+    for depth, cumulative, name in imports:
+        if depth == 1:
+            children.append((cumulative, name))
+        elif depth == 0:
+            if name == "main":
+                main_imports = sorted(children)
+            children = []
+    return {
+        "import_ms": sum(cumulative for depth, cumulative, _ in imports if depth == 0) / 1000,
+        "heaviest": [[name, cumulative / 1000] for cumulative, name in reversed(main_imports[-5:])],
+        "eager_lazy_modules": [name for name in LAZY_MODULES if name in loaded],
+    }
+
+
+def measure_first_frame():
+    """Launch the app in a fresh interpreter; (first frame ms, catalog loaded ms), or None without a display"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", FIRST_FRAME_SCRIPT], cwd=PROJECT_ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    times = {}
+    for line in process.stdout:
+        times[line.split()[0]] = (time.perf_counter() - start) * 1000
+    if process.wait() != 0 or "catalog" not in times:
+        return None
+    return times["first_frame"], times["catalog"]
+
+
+def measure(repeat: int = 5) -> dict:
+    """Best-of-repeat startup timings, with first_frame_ms and catalog_ms None without a display"""
+    record = min((measure_imports() for _ in range(repeat)), key=lambda record: record["import_ms"])
+    launches = [measure_first_frame() for _ in range(repeat)]
+    launches = [launch for launch in launches if launch is not None]
+    record["first_frame_ms"] = min(first_frame for first_frame, _ in launches) if launches else None
+    record["catalog_ms"] = min(catalog_ms for _, catalog_ms in launches) if launches else None
+    return record
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Measure import time and time to first frame of the app.")
+    parser.add_argument("--repeat", type=int, default=5, help="Best-of repetitions")
+    args = parser.parse_args(argv)
+
+    record = measure(args.repeat)
+    print(f"import        {record['import_ms']:>8.1f} ms")
+    for name, milliseconds in record["heaviest"]:
+        print(f"  {name:<20}{milliseconds:>8.1f} ms")
+    if record["first_frame_ms"] is None:
+        print("No display available: first frame timings skipped.")
+    else:
+        print(f"first frame   {record['first_frame_ms']:>8.1f} ms")
+        print(f"catalog       {record['catalog_ms']:>8.1f} ms")
+    if record["eager_lazy_modules"]:
+        print(f"Imported before first use: {', '.join(record['eager_lazy_modules'])}")
+    print(json.dumps(record))
+    return 1 if record["eager_lazy_modules"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
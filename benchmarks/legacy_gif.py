@@ -0,0 +1,66 @@
+"""
+The animation writer used before frames shared one palette, kept so
+run.py can report the size of a per-frame palette GIF (gif_legacy_bytes)
+next to the one write_delta_gif produces.
+"""
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import gif  # noqa: E402
+
+
+def encode_frame(image: Image.Image) -> bytes:
+    """
+    Encode a single image as a standalone one-frame GIF.
+
+    Args:
+        image: Frame to encode; quantized to its own palette by Pillow
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format="GIF")
+    return buffer.getvalue()
+
+
+def write_animated_gif(encoded_frames, output_gif, duration=500, loop=0):
+    """
+    Stream encoded frames into an animated GIF, one frame at a time.
+
+    Every frame keeps its own palette as a local color table, so only the frame
+    being written is ever held in memory.
+
+    Args:
+        encoded_frames: Iterable of one-frame GIFs from encode_frame, in display order
+        output_gif: Path to save the output GIF
+        duration: Duration for each frame in milliseconds
+        loop: Number of loops, 0 means loop forever
+
+    Returns:
+        Number of frames written
+    """
+    os.makedirs(os.path.dirname(output_gif) or ".", exist_ok=True)
+
+    count = 0
+    with open(output_gif, "wb") as file:
+        for data in encoded_frames:
+            if count == 0:
+                # Logical screen of the first frame, without a global color table
+                file.write(b"GIF89a" + data[6:10] + b"\x00" + data[11:13])
+                file.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + loop.to_bytes(2, "little") + b"\x00")
+
+            size_bits, table, block = gif.split_frame(data)
+            # Graphic control extension carrying the frame delay
+            file.write(b"!\xf9\x04\x00" + (duration // 10).to_bytes(2, "little") + b"\x00\x00")
+            flags = block[9] | 0x80 | size_bits if table else block[9]
+            file.write(block[:9] + bytes([flags]) + table + block[10:])
+            count += 1
+        file.write(b";")
+
+    if count == 0:
+        os.remove(output_gif)
+        raise ValueError("No frames to write")
+    return count
@@ -0,0 +1,215 @@
+"""
+Reproducible stage-by-stage benchmark of the bundled example systems.
+
+Usage:
+    python benchmarks/run.py                       # run and write benchmarks/results.json
+    python benchmarks/run.py --save-baseline       # also store the results as the baseline
+    python benchmarks/run.py --compare             # fail (exit 1) on regressions against the baseline
+
+Every (system, iterations) case runs in a fresh process so its peak RSS is
+not inflated by earlier cases. Each stage is timed best-of --repeat:
+
+    generate  LSystem.generate               symbols/sec, string bytes
+    geometry  geometry.compute_segments      segments/sec, array bytes
+    render    raster.render_image            frames/sec
+    gif       gif.write_delta_gif            frames/sec for frames 1..iterations, shared
+                                             palette and delta frames (gif_legacy_bytes is
+                                             the per-frame palette writer of legacy_gif.py,
+                                             for comparison)
+
+Startup (bench_startup.measure) is recorded alongside: the import time of
+main.py and, with a display, the time from launch to the first frame.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bench_startup  # noqa: E402
+from lsystem import utils  # noqa: E402
+from lsystem.instrument import peak_rss_kb  # noqa: E402
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(BENCHMARK_DIR, "results.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Iteration ranges giving each example from ~10^3 up to ~10^6 symbols
+DEFAULT_ITERATIONS = {
+    "dragon_curve": range(12, 19, 2),
+    "fractal_plant": range(4, 8),
+    "koch_curve": range(4, 8),
+    "koch_triangle": range(5, 9),
+    "sierpinski": range(6, 10),
+    "tree": range(8, 15, 2),
+}
+QUICK_ITERATIONS = {name: iterations[:2] for name, iterations in DEFAULT_ITERATIONS.items()}
+
+# Metrics compared against the baseline: higher is better / lower is better
+THROUGHPUT_METRICS = ("symbols_per_sec", "segments_per_sec", "render_fps", "gif_fps")
+FOOTPRINT_METRICS = ("peak_rss_kb",)
+STARTUP_METRICS = ("import_ms", "first_frame_ms")
+
+
+def best_time(function, repeat):
+    """Run function repeat times and return (last result, best wall time)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def run_case(path, iterations, repeat):
+    """Benchmark every stage for one system and iteration count (runs in a child process)"""
+    import legacy_gif
+    from lsystem import geometry, gif, lsystem, raster
+
+    with open(path) as file:
+        system = json.load(file)
+    lsys = lsystem.LSystem(custom_system=system)
+    record = {"system": os.path.splitext(os.path.basename(path))[0], "iterations": iterations}
+
+    instructions, seconds = best_time(lambda: lsys.generate(iterations), repeat)
+    record.update(symbols=len(instructions), string_bytes=sys.getsizeof(instructions),
+                  generate_seconds=seconds, symbols_per_sec=len(instructions) / max(seconds, 1e-9))
+
+    segments, seconds = best_time(lambda: geometry.compute_segments(lsys.lSystem, instructions), repeat)
+    record.update(segments=len(segments), array_bytes=segments.nbytes,
+                  geometry_seconds=seconds, segments_per_sec=len(segments) / max(seconds, 1e-9))
+    del instructions
+
+    _, seconds = best_time(lambda: raster.render_image(segments), repeat)
+    record.update(render_seconds=seconds, render_fps=1 / max(seconds, 1e-9))
+    del segments
+
+    frames = [raster.render_system(system, i) for i in range(1, iterations + 1)]
+    palette = gif.LinePalette(levels=2)
+    with tempfile.TemporaryDirectory() as folder:
+        output = os.path.join(folder, "bench.gif")
+
+        def encode():
+            gif.write_delta_gif((palette.frame(frame) for frame in frames), output, palette=palette)
+            return os.path.getsize(output)
+        gif_bytes, seconds = best_time(encode, repeat)
+        legacy_gif.write_animated_gif((legacy_gif.encode_frame(frame) for frame in frames), output)
+        legacy_bytes = os.path.getsize(output)
+    record.update(gif_frames=len(frames), gif_bytes=gif_bytes, gif_legacy_bytes=legacy_bytes, gif_seconds=seconds,
+                  gif_fps=len(frames) / max(seconds, 1e-9))
+
+    record["peak_rss_kb"] = peak_rss_kb()
+    return record
+
+
+def run_all(cases, repeat):
+    """Run every case in its own fresh process and return the records in order"""
+    records = []
+    context = get_context("spawn")
+    for path, iterations in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            record = executor.submit(run_case, path, iterations, repeat).result()
+        records.append(record)
+        print(f"{record['system']:<15}{record['iterations']:>5}{record['symbols']:>11}{record['segments']:>10}"
+              f"{record['symbols_per_sec']:>14.0f}{record['segments_per_sec']:>14.0f}"
+              f"{record['render_fps']:>10.1f}{record['gif_fps']:>9.1f}{record['peak_rss_kb'] or 0:>11}")
+    return records
+
+
+def compare(records, baseline, threshold):
+    """Return a list of human readable regressions against the baseline records"""
+    reference = {(record["system"], record["iterations"]): record for record in baseline["records"]}
+    regressions = []
+    for record in records:
+        old = reference.get((record["system"], record["iterations"]))
+        if old is None:
+            continue
+        case = f"{record['system']} @ {record['iterations']}"
+        for metric in THROUGHPUT_METRICS:
+            if old.get(metric) and record[metric] < old[metric] * (1 - threshold):
+                regressions.append(f"{case}: {metric} {record[metric]:.1f} < baseline {old[metric]:.1f}")
+        for metric in FOOTPRINT_METRICS:
+            if old.get(metric) and record.get(metric) and record[metric] > old[metric] * (1 + threshold):
+                regressions.append(f"{case}: {metric} {record[metric]} > baseline {old[metric]}")
+    return regressions
+
+
+def compare_startup(startup, baseline, threshold):
+    """Return a list of human readable startup regressions against the baseline startup record"""
+    regressions = []
+    for metric in STARTUP_METRICS:
+        old = (baseline or {}).get(metric)
+        if old and startup.get(metric) and startup[metric] > old * (1 + threshold):
+            regressions.append(f"startup: {metric} {startup[metric]:.1f} > baseline {old:.1f}")
+    if startup["eager_lazy_modules"]:
+        regressions.append(f"startup: imported before first use: {', '.join(startup['eager_lazy_modules'])}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark generation, geometry, rendering and GIF encoding.")
+    parser.add_argument("--systems", nargs="+", help="Example names to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="Only the two smallest iteration counts per system")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of repetitions per stage")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    iterations_table = QUICK_ITERATIONS if args.quick else DEFAULT_ITERATIONS
+    examples_dir = utils.get_examples_dir()
+    cases = []
+    for filename in sorted(os.listdir(examples_dir)):
+        name = os.path.splitext(filename)[0]
+        if filename.endswith(".json") and (not args.systems or name in args.systems):
+            for iterations in iterations_table.get(name, range(4, 7)):
+                cases.append((os.path.join(examples_dir, filename), iterations))
+
+    print(f"{'system':<15}{'iter':>5}{'symbols':>11}{'segments':>10}{'symbols/s':>14}{'segments/s':>14}"
+          f"{'render/s':>10}{'gif/s':>9}{'rss KiB':>11}")
+    records = run_all(cases, args.repeat)
+    startup = bench_startup.measure(args.repeat)
+    first_frame = "no display" if startup["first_frame_ms"] is None else f"{startup['first_frame_ms']:.1f} ms"
+    print(f"\nStartup: import {startup['import_ms']:.1f} ms, first frame {first_frame}")
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "records": records,
+        "startup": startup,
+    }
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 2
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = (compare(records, baseline, args.threshold)
+                       + compare_startup(startup, baseline.get("startup"), args.threshold))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
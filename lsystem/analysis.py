@@ -0,0 +1,106 @@
+from . import lsystem
+
+# Default budgets consulted before generating or drawing a system
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024  # bytes held by generate() at its peak
+DEFAULT_MAX_SEGMENTS = 2_000_000        # forward moves the turtle has to draw
+
+# Outcomes of plan_generation()
+GENERATE = "generate"  # the full string fits in memory
+STREAM = "stream"      # draw from LSystem.iter_symbols() instead of generate()
+REFUSE = "refuse"      # too many segments to draw at all
+
+
+class GrowthAnalyzer:
+    def __init__(self, lsys: lsystem.LSystem):
+        """
+        Build the symbol production matrix of an L-system.
+
+        matrix[a][b] is how many times symbol b appears in the replacement of symbol a,
+        so the symbol counts after n iterations are axiom_counts * matrix^n.
+        """
+        self.lsys = lsys
+        self.alphabet = sorted(lsys.table)
+        index = {char: i for i, char in enumerate(self.alphabet)}
+
+        self.matrix = [[0] * len(self.alphabet) for _ in self.alphabet]
+        for char, replacement in lsys.table.items():
+            row = self.matrix[index[char]]
+            for symbol in replacement:
+                row[index[symbol]] += 1
+
+        self.axiom_counts = [0] * len(self.alphabet)
+        for char in lsys.lSystem["axiom"]:
+            self.axiom_counts[index[char]] += 1
+
+        variables = lsys.lSystem["variables"]
+        self.draw_symbols = {variables["var1"], variables["var2"]}
+
+    @staticmethod
+    def __multiply(left: list, right: list) -> list:
+        """Multiply two square integer matrices"""
+        columns = list(zip(*right))
+        return [[sum(a * b for a, b in zip(row, column)) for column in columns] for row in left]
+
+    def symbol_counts(self, iterations: int) -> dict:
+        """
+        Return the exact number of each symbol after the given iterations.
+
+        Uses repeated squaring of the production matrix, so the cost grows with
+        log(iterations) and the alphabet size, never with the string length.
+        """
+        counts = self.axiom_counts
+        power = self.matrix
+        while iterations > 0:
+            if iterations & 1:
+                counts = [sum(c * p for c, p in zip(counts, column)) for column in zip(*power)]
+            iterations >>= 1
+            if iterations:
+                power = self.__multiply(power, power)
+        return {char: count for char, count in zip(self.alphabet, counts) if count}
+
+    def length(self, iterations: int) -> int:
+        """Exact length of generate(iterations)"""
+        return sum(self.symbol_counts(iterations).values())
+
+    def segments(self, iterations: int) -> int:
+        """Exact number of forward moves LSystem.draw makes for generate(iterations)"""
+        counts = self.symbol_counts(iterations)
+        return sum(counts.get(char, 0) for char in self.draw_symbols)
+
+    def memory(self, iterations: int) -> int:
+        """
+        Estimated peak bytes held while running generate(iterations).
+
+        The last rewrite keeps the previous generation alive next to the new byte
+        buffer, and the result is then decoded into a string of the same length.
+        """
+        if iterations <= 0:
+            return self.length(0)
+        return self.length(iterations - 1) + 2 * self.length(iterations)
+
+
+def plan_generation(analyzer: GrowthAnalyzer, iterations: int,
+                    max_memory: int = DEFAULT_MAX_MEMORY,
+                    max_segments: int = DEFAULT_MAX_SEGMENTS) -> str:
+    """
+    Decide how a system may be produced within the given budgets.
+
+    :param analyzer: GrowthAnalyzer for the system.
+    :param iterations: Number of iterations requested.
+    :param max_memory: Largest estimated peak memory allowed for generate().
+    :param max_segments: Largest number of segments allowed to be drawn.
+    :return: GENERATE, STREAM or REFUSE.
+    """
+    if analyzer.segments(iterations) > max_segments:
+        return REFUSE
+    if analyzer.memory(iterations) > max_memory:
+        return STREAM
+    return GENERATE
+
+
+def format_size(num_bytes: int) -> str:
+    """Format a byte count for display"""
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if num_bytes < 1024 or unit == "TB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{num_bytes} B"
+        num_bytes /= 1024
@@ -0,0 +1,369 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+from . import analysis
+from . import geometry
+from . import instancing
+from . import lsystem
+from . import segments
+from . import utils
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump whenever rewriting or the turtle walk change what a system draws, so
+# geometry cached by an older engine is never served again
+GEOMETRY_VERSION = 1
+
+DEFAULT_MAX_DISK_BYTES = 4 * 1024 * 1024 * 1024
+
+# Drawings with fewer segments are cheaper to recompute than to keep on disk
+DEFAULT_MIN_SEGMENTS = 1 << 16
+
+# Appended after the segment dump: magic, geometry version, key digest, CRC-32 of the segment bytes
+FOOTER = struct.Struct("<4sI32sI")
+FOOTER_MAGIC = b"LSGC"
+
+
+def system_key(system: dict) -> str:
+    """
+    Canonical hash of the parts of a system that determine its generated strings.
+
+    Drawing settings and the start position do not change the rewriting, so systems
+    that only differ there share cache entries.
+    """
+    rewriting = {key: system.get(key) for key in ("axiom", "variables", "rules")}
+    canonical = json.dumps(rewriting, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def geometry_key(system: dict, dtype="float32") -> str:
+    """
+    Canonical hash of everything that determines the segments a system draws.
+
+    The system is normalized through LSystem first, so sections left out hash the
+    same as their defaults. The geometry version and the stored dtype are part of
+    the key.
+    """
+    normalized = lsystem.LSystem(custom_system=system).lSystem
+    drawing = {key: normalized.get(key) for key in ("axiom", "variables", "rules", "settings", "goto")}
+    drawing["version"] = GEOMETRY_VERSION
+    drawing["dtype"] = np.dtype(dtype).name
+    canonical = json.dumps(drawing, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Size-bounded LRU cache of generated L-system strings.
+
+        Entries are keyed by (system_key(system), iterations). A miss is seeded from
+        the highest cached lower iteration of the same system, so stepping the
+        iteration count up by one costs a single rewrite.
+
+        :param max_bytes: Total length of the cached strings allowed before evicting.
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def generate(self, system: dict, iterations: int, lsys: lsystem.LSystem = None) -> str:
+        """
+        Return generate(iterations) for a system, from the cache when possible.
+
+        :param system: L-system definition.
+        :param iterations: Number of iterations.
+        :param lsys: Already built LSystem for the system, to skip rebuilding it on a miss.
+        """
+        key = system_key(system)
+        if (key, iterations) in self.entries:
+            self.hits += 1
+            self.entries.move_to_end((key, iterations))
+            return self.entries[(key, iterations)]
+
+        self.misses += 1
+        seed_iterations, seed = 0, None
+        for (entry_key, entry_iterations), instructions in self.entries.items():
+            if entry_key == key and seed_iterations <= entry_iterations < iterations:
+                seed_iterations, seed = entry_iterations, instructions
+        if seed is not None:
+            self.entries.move_to_end((key, seed_iterations))
+
+        if lsys is None:
+            lsys = lsystem.LSystem(custom_system=system)
+        if seed is None:
+            seed = lsys.lSystem["axiom"]
+        instructions = lsys.rewrite(seed, iterations - seed_iterations)
+        self.put(key, iterations, instructions)
+        return instructions
+
+    def put(self, key: str, iterations: int, instructions: str) -> None:
+        """Store a generated string and evict least recently used entries over the limit"""
+        if len(instructions) > self.max_bytes:
+            return
+        if (key, iterations) in self.entries:
+            self.size -= len(self.entries.pop((key, iterations)))
+        self.entries[(key, iterations)] = instructions
+        self.size += len(instructions)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        self.entries.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current usage"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+class GeometryCache:
+    def __init__(self, folder: str = None, max_bytes: int = DEFAULT_MAX_DISK_BYTES, dtype="float32",
+                 min_segments: int = DEFAULT_MIN_SEGMENTS):
+        """
+        Size-capped on-disk cache of segment arrays, opened with memory mapping.
+
+        Entries are keyed by (geometry_key(system), iterations). Each file is a
+        segments.write_segments dump followed by a footer with the geometry
+        version, the key and a CRC-32 of the segment bytes, so it stays readable
+        with segments.read_segments. Opening an entry checks the header, the footer
+        and the file size, and maps the data: reopening a huge drawing costs no
+        memory beyond the pages actually read. Checking the CRC reads the whole file,
+        so it is only done on request (get(verify=True)). Files are written under a
+        temporary name and renamed into place, and the least recently used ones
+        are evicted once the folder grows over max_bytes.
+
+        :param folder: Cache folder, by default utils.get_cache_dir().
+        :param max_bytes: Total size of the cache files allowed before evicting.
+        :param dtype: "float32" or "float64" coordinates.
+        :param min_segments: Smallest drawing worth storing, used by callers deciding what to cache.
+        """
+        self.folder = folder or utils.get_cache_dir()
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.min_segments = min_segments
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+
+    def path(self, key: str, iterations: int) -> str:
+        """File of one entry"""
+        return os.path.join(self.folder, f"{key}_{iterations}.lseg")
+
+    def __open(self, path: str, key: str, verify: bool) -> np.ndarray:
+        """
+        Validate and memory-map one cache file.
+
+        :raises ValueError: If the file is truncated, from another engine version or
+                            key, or (with verify) its segment bytes fail the checksum.
+        """
+        size = os.path.getsize(path)
+        with open(path, "rb") as file:
+            header = file.read(segments.HEADER.size)
+            if len(header) < segments.HEADER.size:
+                raise ValueError("truncated header")
+            magic, version, itemsize, count = segments.HEADER.unpack(header)
+            if magic != segments.MAGIC or version != segments.VERSION or itemsize != self.dtype.itemsize:
+                raise ValueError("not a segment dump of the cached dtype")
+            data_size = count * 4 * itemsize
+            if size != segments.HEADER.size + data_size + FOOTER.size:
+                raise ValueError("wrong file size")
+            file.seek(segments.HEADER.size + data_size)
+            footer_magic, geometry_version, digest, checksum = FOOTER.unpack(file.read(FOOTER.size))
+        if footer_magic != FOOTER_MAGIC or geometry_version != GEOMETRY_VERSION or digest != bytes.fromhex(key):
+            raise ValueError("stale or foreign entry")
+        if count == 0:
+            return np.empty((0, 4), dtype=self.dtype)
+        array = np.memmap(path, dtype=self.dtype, mode="r", offset=segments.HEADER.size, shape=(count, 4))
+        if verify:
+            crc = 0
+            flat = array.reshape(-1)
+            for start in range(0, len(flat), 1 << 22):
+                crc = zlib.crc32(flat[start:start + (1 << 22)].tobytes(), crc)
+            if crc != checksum:
+                raise ValueError("checksum mismatch")
+        return array
+
+    def get(self, system: dict, iterations: int, verify: bool = False):
+        """
+        The cached segments of a system, or None on a miss.
+
+        A truncated, stale or (with verify) corrupt file counts as a miss and is deleted.
+
+        :param verify: Also check the CRC-32 of the segment bytes, which reads the whole file.
+        :return: Read-only memory-mapped array of shape (N, 4), or None.
+        """
+        key = geometry_key(system, self.dtype)
+        path = self.path(key, iterations)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            array = self.__open(path, key, verify)
+        except (OSError, ValueError):
+            self.corrupt += 1
+            self.misses += 1
+            self.__remove(path)
+            return None
+        self.hits += 1
+        try:
+            os.utime(path)  # Recently used, for eviction
+        except OSError:
+            pass
+        return array
+
+    def contains(self, system: dict, iterations: int) -> bool:
+        """Whether a valid entry is stored, checked like get() but without counting a hit or miss"""
+        key = geometry_key(system, self.dtype)
+        try:
+            self.__open(self.path(key, iterations), key, verify=False)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def iter_store(self, system: dict, iterations: int, chunks):
+        """
+        Pass segment chunks through while writing them to the cache.
+
+        The entry is committed once every chunk has been consumed; if the consumer
+        stops early (e.g. a cancelled task closes the generator) nothing is stored.
+
+        :param chunks: Iterable of (N, 4) arrays.
+        """
+        key = geometry_key(system, self.dtype)
+        path = self.path(key, iterations)
+        os.makedirs(self.folder, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        committed = False
+        try:
+            with open(temporary, "wb") as file:
+                file.write(segments.HEADER.pack(segments.MAGIC, segments.VERSION, self.dtype.itemsize, 0))
+                count = 0
+                crc = 0
+                for chunk in chunks:
+                    data = np.ascontiguousarray(chunk, dtype=self.dtype).tobytes()
+                    crc = zlib.crc32(data, crc)
+                    file.write(data)
+                    count += len(chunk)
+                    yield chunk
+                file.write(FOOTER.pack(FOOTER_MAGIC, GEOMETRY_VERSION, bytes.fromhex(key), crc))
+                file.seek(0)
+                file.write(segments.HEADER.pack(segments.MAGIC, segments.VERSION, self.dtype.itemsize, count))
+            os.replace(temporary, path)
+            committed = True
+        finally:
+            if not committed:
+                self.__remove(temporary)
+        self.evict(keep=path)
+
+    def put(self, system: dict, iterations: int, chunks) -> np.ndarray:
+        """Store segment chunks and return the stored entry, memory-mapped"""
+        for _ in self.iter_store(system, iterations, chunks):
+            pass
+        key = geometry_key(system, self.dtype)
+        return self.__open(self.path(key, iterations), key, verify=False)
+
+    def segments(self, system: dict, iterations: int) -> np.ndarray:
+        """The segments of a system, computed (instanced when possible) and stored on a miss"""
+        array = self.get(system, iterations)
+        if array is None:
+            lsys = lsystem.LSystem(custom_system=system)
+            array = self.put(system, iterations, instancing.iter_system_segments(lsys, iterations))
+        return array
+
+    def iter_chunks(self, system: dict, iterations: int, chunk_size: int = geometry.DEFAULT_CHUNK_SIZE):
+        """
+        Segment chunks of a system, read through the cache when it is worth storing.
+
+        Systems drawing at least min_segments segments come from segments(), so a
+        render on a miss uses the same stored coordinates as every later one; smaller
+        ones are computed directly (instanced when possible).
+        """
+        lsys = lsystem.LSystem(custom_system=system)
+        if analysis.GrowthAnalyzer(lsys).segments(iterations) < self.min_segments:
+            return instancing.iter_system_segments(lsys, iterations, chunk_size)
+        array = self.segments(system, iterations)
+        return (array[start:start + chunk_size] for start in range(0, len(array), chunk_size))
+
+    def __entries(self) -> list:
+        """(mtime, size, path) of every cache file"""
+        entries = []
+        if not os.path.isdir(self.folder):
+            return entries
+        with os.scandir(self.folder) as scan:
+            for entry in scan:
+                if entry.name.endswith(".lseg") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def __stale(self, path: str) -> bool:
+        """Whether a file was written by another geometry version (or cannot be read)"""
+        try:
+            with open(path, "rb") as file:
+                file.seek(-FOOTER.size, os.SEEK_END)
+                footer_magic, geometry_version, _, _ = FOOTER.unpack(file.read(FOOTER.size))
+        except (OSError, struct.error):
+            return True
+        return footer_magic != FOOTER_MAGIC or geometry_version != GEOMETRY_VERSION
+
+    def evict(self, keep: str = None) -> int:
+        """
+        Delete files from other geometry versions, then least recently used files
+        until the cache fits in max_bytes.
+
+        :param keep: A file never evicted, e.g. the one just written.
+        :return: Number of files deleted.
+        """
+        entries = []
+        removed = 0
+        for entry in sorted(self.__entries()):
+            if entry[2] != keep and self.__stale(entry[2]):
+                removed += self.__remove(entry[2])
+            else:
+                entries.append(entry)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            if self.__remove(path):
+                total -= size
+                removed += 1
+        return removed
+
+    @staticmethod
+    def __remove(path: str) -> bool:
+        """Delete a file, tolerating one that is gone or still mapped elsewhere"""
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+    def clear(self) -> None:
+        """Delete every cache file and reset the counters"""
+        for _, _, path in self.__entries():
+            self.__remove(path)
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current disk usage"""
+        entries = self.__entries()
+        return {"hits": self.hits, "misses": self.misses, "corrupt": self.corrupt, "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes}
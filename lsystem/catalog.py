@@ -0,0 +1,159 @@
+import json
+import os
+from numbers import Number
+from . import utils
+
+# Bumped whenever the index layout or the validation rules change
+INDEX_VERSION = 2
+
+SETTINGS_KEYS = ("angle", "distance", "headingAngle", "turnLeftStack", "turnRightStack")
+
+
+def get_index_path() -> str:
+    """Default location of the catalog index, next to the system folders"""
+    return os.path.join(utils.get_project_root(), "data", "catalog_index.json")
+
+
+def validate_system(system) -> None:
+    """
+    Check the schema of an L-system definition.
+
+    Sections left out fall back to the LSystem defaults, but the ones present
+    must be complete and of the right types. Rules are the legacy r1/r2 pair,
+    single-symbol productions, or both.
+
+    :raises ValueError: Describing the first problem found.
+    """
+    if not isinstance(system, dict):
+        raise ValueError("system must be a JSON object")
+    if "axiom" in system and not isinstance(system["axiom"], str):
+        raise ValueError("axiom must be a string")
+    rules = system.get("rules", {})
+    if not isinstance(rules, dict):
+        raise ValueError("rules must be an object")
+    for key, successor in rules.items():
+        if key not in ("r1", "r2") and len(key) != 1:
+            raise ValueError(f"rules.{key} must be r1, r2 or a single symbol")
+        if not isinstance(successor, str):
+            raise ValueError(f"rules.{key} must be a string")
+    if ("r1" in rules) != ("r2" in rules):
+        raise ValueError("rules.r1 and rules.r2 must be given together")
+
+    sections = {"variables": ("var1", "var2"), "settings": SETTINGS_KEYS, "goto": ("x", "y")}
+    for section, keys in sections.items():
+        if section not in system:
+            continue
+        if not isinstance(system[section], dict):
+            raise ValueError(f"{section} must be an object")
+        for key in keys:
+            if key not in system[section]:
+                raise ValueError(f"{section}.{key} is missing")
+            value = system[section][key]
+            if section == "variables":
+                if not isinstance(value, str):
+                    raise ValueError(f"{section}.{key} must be a string")
+            elif not isinstance(value, Number) or isinstance(value, bool):
+                raise ValueError(f"{section}.{key} must be a number")
+    for key in ("var1", "var2"):
+        if len(system.get("variables", {}).get(key, "F")) != 1:
+            raise ValueError(f"variables.{key} must be a single symbol")
+
+
+class SystemCatalog:
+    def __init__(self, folders: list, index_path: str = None):
+        """
+        Catalog of the L-system JSON files in some folders, backed by a persistent index.
+
+        The index records the mtime and size of every file with its parsed and
+        validated contents, so refresh() only re-reads files that changed. When two
+        folders hold the same name, the later folder wins (custom over examples).
+
+        :param folders: Folders to scan, in priority order.
+        :param index_path: JSON index file, by default get_index_path(); pass False
+                           to keep the index in memory only.
+        """
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.index_path = get_index_path() if index_path is None else index_path
+        self.entries = {}  # path -> {"mtime_ns", "size", "name", "system", "error"}
+        self.systems = {}  # name -> system, valid entries only
+        self.__load_index()
+
+    def __load_index(self) -> None:
+        """Read the persistent index, ignoring it when missing, corrupt or outdated"""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+        if isinstance(index, dict) and index.get("version") == INDEX_VERSION:
+            self.entries = index.get("entries", {})
+
+    def __save_index(self) -> None:
+        """Write the index atomically, so a crash never leaves a torn file behind"""
+        if not self.index_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        temporary_path = self.index_path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({"version": INDEX_VERSION, "entries": self.entries}, file)
+        os.replace(temporary_path, self.index_path)
+
+    @staticmethod
+    def __parse(path: str) -> tuple:
+        """Read and validate one file, returning (system, error)"""
+        try:
+            with open(path, "r") as file:
+                system = json.load(file)
+            validate_system(system)
+        except (OSError, ValueError) as e:
+            return None, f"{type(e).__name__}: {e}"
+        return system, None
+
+    def refresh(self) -> dict:
+        """
+        Rescan the folders, re-parsing only files whose mtime or size changed.
+
+        :return: Counts of "added", "changed", "removed" and "unchanged" files.
+        """
+        counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        seen = []
+        for folder in self.folders:
+            if not os.path.isdir(folder):
+                continue
+            with os.scandir(folder) as scan:
+                files = sorted((entry for entry in scan if entry.name.endswith(".json") and entry.is_file()),
+                               key=lambda entry: entry.name)
+            for entry in files:
+                stat = entry.stat()
+                seen.append(entry.path)
+                cached = self.entries.get(entry.path)
+                if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+                    counts["unchanged"] += 1
+                    continue
+                counts["changed" if cached else "added"] += 1
+                system, error = self.__parse(entry.path)
+                self.entries[entry.path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+                                            "name": os.path.splitext(entry.name)[0],
+                                            "system": system, "error": error}
+
+        seen_paths = set(seen)
+        for path in [path for path in self.entries if path not in seen_paths]:
+            del self.entries[path]
+            counts["removed"] += 1
+
+        # Name lookup in folder order, so later folders override earlier ones
+        self.systems = {}
+        for path in seen:
+            entry = self.entries[path]
+            if entry["system"] is not None:
+                self.systems[entry["name"]] = entry["system"]
+
+        if counts["added"] or counts["changed"] or counts["removed"]:
+            self.__save_index()
+        return counts
+
+    def errors(self) -> list:
+        """(path, error) for every file that failed to parse or validate"""
+        return [(path, entry["error"]) for path, entry in self.entries.items() if entry["error"]]
@@ -0,0 +1,215 @@
+"""
+Headless batch rendering of L-system JSON files.
+
+Never imports tkinter or turtle, so it runs without a display:
+
+    python render.py data/examples data/custom --iterations 1-6 --formats png svg gif
+
+The seg format is a binary dump of the raw segments (see segments.py); gif,
+apng and webp are animations of frames 1 up to the highest iteration count.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import analysis
+from . import catalog
+from . import lsystem
+from . import utils
+
+FORMATS = ("png", "svg", "gif", "apng", "webp", "seg")
+ANIMATION_FORMATS = ("gif", "apng", "webp")
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILED_JOBS = 1
+EXIT_USAGE = 2
+
+
+def parse_iterations(text: str) -> list:
+    """
+    Parse an iteration spec such as "6", "1-6" or "2,4,8-10" into a sorted list.
+
+    :raises ValueError: On a malformed or negative spec.
+    """
+    iterations = set()
+    for part in text.split(","):
+        part = part.strip()
+        if "-" in part:
+            low, high = (int(value) for value in part.split("-", 1))
+            if low > high:
+                raise ValueError(f"Empty iteration range: {part}")
+            iterations.update(range(low, high + 1))
+        else:
+            iterations.add(int(part))
+    if not iterations or min(iterations) < 0:
+        raise ValueError(f"Invalid iterations: {text}")
+    return sorted(iterations)
+
+
+def collect_system_files(paths: list) -> list:
+    """
+    Expand files and folders into a sorted list of system JSON files.
+
+    :raises FileNotFoundError: If a path does not exist.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".json"))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"No such file or folder: {path}")
+    return files
+
+
+def run_job(job: dict) -> dict:
+    """
+    Render one (system, iterations, format) job; runs in a worker process.
+
+    Errors are reported in the returned record instead of raised, so one bad
+    system does not stop the batch. With a "cache" folder in the job, png, svg and
+    seg output read large systems through a cache.GeometryCache there, and a system
+    already stored in it is rendered whatever its size.
+    """
+    start = time.perf_counter()
+    result = {"name": job["name"], "iterations": job["iterations"], "format": job["format"],
+              "output": job["output"], "segments": 0, "error": None}
+    try:
+        if job.get("system") is not None:
+            system = job["system"]
+        else:
+            with open(job["path"], "r") as file:
+                system = json.load(file)
+        catalog.validate_system(system)
+        lsys = lsystem.LSystem(custom_system=system)
+        analyzer = analysis.GrowthAnalyzer(lsys)
+        result["segments"] = analyzer.segments(job["iterations"])
+        geometry_cache = None
+        if job.get("cache") and job["format"] not in ANIMATION_FORMATS:
+            from . import cache
+            geometry_cache = cache.GeometryCache(job["cache"])
+        if result["segments"] > job["max_segments"] and not (
+                geometry_cache is not None and geometry_cache.contains(system, job["iterations"])):
+            raise ValueError(f"{result['segments']} segments is over the budget of {job['max_segments']}")
+
+        options = job["options"]
+        if job["format"] == "png":
+            from . import raster
+            raster.render_system(system, job["iterations"], cache=geometry_cache, **options).save(job["output"])
+        elif job["format"] == "svg":
+            from . import svg
+            svg.render_system_svg(system, job["iterations"], job["output"], cache=geometry_cache, **options)
+        elif job["format"] == "seg":
+            from . import segments
+            segments.dump_system(system, job["iterations"], job["output"], cache=geometry_cache, **options)
+        elif job["format"] in ANIMATION_FORMATS:
+            from . import gif
+            palette = gif.frame_palette(options)
+            frames = gif.iter_frames(system, job["iterations"], palette=palette, **options)
+            gif.write_animation(frames, job["output"], duration=job["duration"], palette=palette,
+                                animation_format=job["format"])
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def format_options(fmt: str, settings: dict) -> dict:
+    """
+    Keyword arguments for the renderer of one format, picked from general settings.
+
+    :param settings: width, height, scale, fit, supersample, deterministic and instanced.
+    """
+    options = {"width": settings["width"], "height": settings["height"], "scale": settings["scale"]}
+    if fmt in ANIMATION_FORMATS:
+        return dict(options, fit=settings["fit"])
+    if fmt == "png":
+        return dict(options, fit=settings["fit"], supersample=settings["supersample"])
+    if fmt == "svg":
+        return dict(options, fit=settings["fit"], deterministic=settings["deterministic"],
+                    instanced=settings["instanced"])
+    return {}  # Raw turtle coordinates
+
+
+def build_jobs(files: list, iterations: list, formats: list, output_dir: str, args) -> list:
+    """Create one job per system, iteration and still format, plus one animation per system and animation format"""
+    jobs = []
+    for path in files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        for fmt in formats:
+            job = {"path": path, "name": name, "format": fmt, "max_segments": args.max_segments,
+                   "duration": args.duration, "cache": None if args.no_cache else utils.get_cache_dir()}
+            job_options = format_options(fmt, vars(args))
+            if fmt in ANIMATION_FORMATS:
+                # One animation covering frames 1..max(iterations)
+                jobs.append(dict(job, iterations=max(iterations), options=job_options,
+                                 output=os.path.join(output_dir, f"{name}.{fmt}")))
+                continue
+            for n in iterations:
+                jobs.append(dict(job, iterations=n, options=job_options,
+                                 output=os.path.join(output_dir, f"{name}_{n}.{fmt}")))
+    return jobs
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="render.py", description="Render L-systems without a display.")
+    parser.add_argument("paths", nargs="+", help="System JSON files or folders containing them")
+    parser.add_argument("-i", "--iterations", default="6", help='Iterations, e.g. "6", "1-6" or "2,4,8-10"')
+    parser.add_argument("-f", "--formats", nargs="+", choices=FORMATS, default=["png"], help="Output formats")
+    parser.add_argument("-o", "--output", default=None, help="Output folder (default: the animations folder)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--scale", type=float, default=1.0, help="Pixels per turtle unit")
+    parser.add_argument("--fit", action="store_true", help="Scale and center PNG, SVG and animation output to fill the image")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="Leave the creation time out of SVG files so reruns are byte-identical")
+    parser.add_argument("--instanced", action="store_true",
+                        help="Write SVG files as reused blocks of geometry instead of every segment")
+    parser.add_argument("--supersample", type=int, default=1, help="PNG anti-aliasing factor")
+    parser.add_argument("--duration", type=int, default=500, help="Animation frame duration in milliseconds")
+    parser.add_argument("--max-segments", type=int, default=analysis.DEFAULT_MAX_SEGMENTS * 10,
+                        help="Refuse jobs predicted to draw more segments than this (unless already cached)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Neither read nor store PNG, SVG and seg geometry in the geometry cache")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Run the batch and print a per-job timing summary; returns the exit code"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        iterations = parse_iterations(args.iterations)
+        files = collect_system_files(args.paths)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not files:
+        print("Error: no system JSON files found", file=sys.stderr)
+        return EXIT_USAGE
+
+    output_dir = args.output or utils.get_animations_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = build_jobs(files, iterations, args.formats, output_dir, args)
+
+    start = time.perf_counter()
+    if args.jobs <= 1:
+        results = [run_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(run_job, jobs))
+    total = time.perf_counter() - start
+
+    failed = [result for result in results if result["error"]]
+    print(f"{'system':<24}{'iter':>5} {'format':<7}{'segments':>12}{'seconds':>10}  result")
+    for result in results:
+        outcome = result["error"] or result["output"]
+        print(f"{result['name']:<24}{result['iterations']:>5} {result['format']:<7}"
+              f"{result['segments']:>12}{result['seconds']:>10.3f}  {outcome}")
+    print(f"{len(results) - len(failed)}/{len(results)} jobs succeeded in {total:.3f}s with {args.jobs} worker(s)")
+    return EXIT_FAILED_JOBS if failed else EXIT_OK
@@ -1,12 +1,33 @@
+import copy
 import turtle
 import tkinter as tk
+from tkinter import ttk
 import os
-from PIL import Image
+import time
 from datetime import datetime
-from . import gif
+from . import geometry
 from . import systems
 from . import lsystem
 from . import utils
+from . import viewport
+from . import analysis
+from . import cache
+from . import catalog
+from . import instancing
+from . import instrument
+from . import preview
+from . import progressive
+from . import worker
+
+# Shown until the catalog has loaded, and when it holds no valid systems
+DEFAULT_SYSTEM_NAME = "Custom"
+DEFAULT_SYSTEM = {
+    "axiom": "F",
+    "variables": {"var1": "F", "var2": "F"},
+    "rules": {"r1": "F+F-F-F+F", "r2": "f"},
+    "settings": {"angle": 90, "distance": 5, "headingAngle": 0, "turnLeftStack": 0, "turnRightStack": 0},
+    "goto": {"x": 0, "y": 0}
+}
 
 
 class LSystemControlPanel:
@@ -16,21 +37,58 @@ class LSystemControlPanel:
         self.new_win = tk.Toplevel(root)
         self.new_win.title("Control Panel")
         
-        # Use utility functions for consistent path handling
-        example_systems = systems.load_systems_from_folder(utils.get_examples_dir()) 
-        custom_systems = systems.load_systems_from_folder(utils.get_custom_dir())
-        
-        self.systems = example_systems if example_systems else {}
-        if custom_systems:
-            self.systems.update(custom_systems)
-        if not self.systems:
-            self.systems = {"Custom": {
-                "axiom": "F",
-                "variables": {"var1": "F", "var2": "F"},
-                "rules": {"r1": "F+F-F-F+F", "r2": "f"},
-                "settings": {"angle": 90, "distance": 5, "headingAngle": 0, "turnLeftStack": 0, "turnRightStack": 0},
-                "goto": {"x": 0, "y": 0}
-            }}
+        # Indexed catalog of the example and custom systems; only changed files are re-read.
+        # It is opened and scanned on a background thread once the window is up, and the
+        # panel shows the default system until then
+        self.catalog = None
+        self.catalog_task = None
+        self.systems = {DEFAULT_SYSTEM_NAME: copy.deepcopy(DEFAULT_SYSTEM)}
+        
+        # Budgets checked against the predicted size before generating or drawing
+        self.max_memory = analysis.DEFAULT_MAX_MEMORY
+        self.max_segments = analysis.DEFAULT_MAX_SEGMENTS
+        
+        # Generated strings shared by the preview, draw and animate paths, and
+        # the segments of large drawings kept on disk across sessions
+        self.generation_cache = cache.GenerationCache()
+        self.geometry_cache = cache.GeometryCache()
+        
+        # Largest number of worker processes rendering animation frames (small animations stay in this process)
+        self.animation_workers = os.cpu_count() or 1
+        
+        # Opt-in JSON-lines log of per-stage timings, and the folder for cProfile dumps
+        self.stage_log_path = os.environ.get("LSYSTEM_STAGE_LOG")
+        self.profile_dir = os.path.join(utils.get_animations_dir(), "profiles")
+        self.profile_path = None
+        
+        # Drawing and animation run on a background task; symbols are walked in
+        # chunks of this size between progress reports and cancellation checks
+        self.task = None
+        self.progress_chunk_size = 1 << 18
+        
+        # Results are drawn progressively on the main thread: pieces of at most
+        # piece_points points, drawing for a budget of milliseconds per frame
+        self.drawing = None
+        self.piece_points = progressive.DEFAULT_PIECE_POINTS
+        self.frame_rate = progressive.DEFAULT_FRAME_RATE
+        self.draw_budget_ms = progressive.DEFAULT_BUDGET_MS
+        self.fast_budget_ms = 25
+        
+        # Longest list shown in the system OptionMenu
+        self.max_menu_entries = 200
+        
+        # Turtle window size; drawings and animation frames are fitted and culled to it
+        self.screen_width = 800
+        self.screen_height = 600
+        
+        # Paged view of the last generated string
+        self.preview = None
+        self.preview_page = 0
+        
+        # Input fields showing the selected system as (widget, section, key), refreshed
+        # together by one pending after_idle() call however often the selection is written
+        self.fields = []
+        self.fields_update = None
         
         # Create a control variable initialized with a default key
         self.selected_var = tk.StringVar(self.new_win)
@@ -38,14 +96,28 @@ class LSystemControlPanel:
         
         # Set up UI components and entry fields
         self.setup_ui()
+        
+        # Load the catalog once the window has been drawn
+        self.new_win.after_idle(self.__load_systems)
     
-    def __update_text(self, text_input, parameter1, parameter2=None, *args):
-        """Update the text in an input field based on the selected L-system"""
+    @staticmethod
+    def __set_text(text_input, value):
+        """Replace the content of a one-line input field"""
         text_input.delete("1.0", tk.END)
-        if parameter2:
-            text_input.insert(tk.END, self.systems[self.selected_var.get()][parameter1][parameter2])
-        else:
-            text_input.insert(tk.END, self.systems[self.selected_var.get()][parameter1])
+        text_input.insert(tk.END, value)
+    
+    def __schedule_fields_update(self, *args):
+        """Selection trace: refresh the fields on the next idle moment, once per batch of writes"""
+        if self.fields_update is None:
+            self.fields_update = self.new_win.after_idle(self.__update_fields)
+    
+    def __update_fields(self):
+        """Show the selected L-system in every input field"""
+        self.fields_update = None
+        system = self.systems[self.selected_var.get()]
+        for text_input, parameter, parameter2 in self.fields:
+            self.__set_text(text_input, system[parameter].get(parameter2, "") if parameter2 else system[parameter])
+        self.__set_text(self.input_text_productions, self.__format_productions(system["rules"]))
             
     def __create_input(self, window, label_text, parameter, parameter2=None, column=0, row=7, *args):
         """Create a labeled text input field and initialize it with the current system's value"""
@@ -55,20 +127,52 @@ class LSystemControlPanel:
         text_input = tk.Text(window, height=1, width=20)
         text_input.grid(row=row, column=column+1, padx=5, pady=5)
         
-        if parameter2:
-            text_input.insert(tk.END, self.systems[self.selected_var.get()][parameter][parameter2])
-        else:
-            text_input.insert(tk.END, self.systems[self.selected_var.get()][parameter])
+        system = self.systems[self.selected_var.get()]
+        self.__set_text(text_input, system[parameter].get(parameter2, "") if parameter2 else system[parameter])
+        self.fields.append((text_input, parameter, parameter2))
         
         return text_input
     
+    @staticmethod
+    def __format_productions(rules):
+        """Single-symbol productions as "A=B-A-B; B=A+B+A\""""
+        return "; ".join(f"{symbol}={successor}" for symbol, successor in rules.items() if len(symbol) == 1)
+    
+    @staticmethod
+    def __parse_productions(text):
+        """
+        Parse "A=B-A-B; B=A+B+A" into a production map.
+        
+        :raises ValueError: If an entry is not a single symbol followed by "=".
+        """
+        productions = {}
+        for entry in text.split(";"):
+            entry = entry.strip()
+            if not entry:
+                continue
+            symbol, separator, successor = entry.partition("=")
+            symbol = symbol.strip()
+            if not separator or len(symbol) != 1:
+                raise ValueError(f"Invalid production: {entry}")
+            productions[symbol] = successor.strip()
+        return productions
+    
     def __create_system_from_input(self):
         """Read all input fields and update the current L-system configuration"""
+        if self.fields_update is not None:
+            # The selection changed and its values are not shown yet
+            self.new_win.after_cancel(self.fields_update)
+            self.__update_fields()
         self.systems[self.selected_var.get()]["axiom"] = self.input_text_axiom.get("1.0", tk.END).strip()
         self.systems[self.selected_var.get()]["variables"]["var1"] = self.input_text_var1.get("1.0", tk.END).strip()
         self.systems[self.selected_var.get()]["variables"]["var2"] = self.input_text_var2.get("1.0", tk.END).strip()
-        self.systems[self.selected_var.get()]["rules"]["r1"] = self.input_text_rule1.get("1.0", tk.END).strip()
-        self.systems[self.selected_var.get()]["rules"]["r2"] = self.input_text_rule2.get("1.0", tk.END).strip()
+        rules = {"r1": self.input_text_rule1.get("1.0", tk.END).strip(),
+                 "r2": self.input_text_rule2.get("1.0", tk.END).strip()}
+        # Production-only systems stay that way unless legacy rules are typed in
+        if "r1" not in self.systems[self.selected_var.get()]["rules"] and not any(rules.values()):
+            rules = {}
+        rules.update(self.__parse_productions(self.input_text_productions.get("1.0", tk.END)))
+        self.systems[self.selected_var.get()]["rules"] = rules
         self.systems[self.selected_var.get()]["settings"]["angle"] = int(self.input_text_angle.get("1.0", tk.END).strip())
         self.systems[self.selected_var.get()]["settings"]["distance"] = float(self.input_text_distance.get("1.0", tk.END).strip())
         self.systems[self.selected_var.get()]["settings"]["headingAngle"] = int(self.input_text_headingAngle.get("1.0", tk.END).strip())
@@ -79,15 +183,87 @@ class LSystemControlPanel:
 
         return self.systems[self.selected_var.get()]
     
-    def update_instructions(self):
-        """Generate and display the instruction string in the preview area"""
+    def __plan_generation(self, system, iterations):
+        """Predict the size of a system and decide whether to generate, stream or refuse it"""
+        analyzer = analysis.GrowthAnalyzer(lsystem.LSystem(custom_system=system))
+        plan = analysis.plan_generation(analyzer, iterations, self.max_memory, self.max_segments)
+        summary = (f"Iterations: {iterations}\n"
+                   f"Predicted length: {analyzer.length(iterations)} symbols\n"
+                   f"Predicted segments: {analyzer.segments(iterations)}\n"
+                   f"Estimated memory: {analysis.format_size(analyzer.memory(iterations))}\n")
+        return plan, summary
+    
+    def __show_timings(self, recorder):
+        """Prepend the per-stage timing summary to the instructions area and log the records"""
+        self.instructions_.config(state=tk.NORMAL)
+        self.instructions_.insert("1.0", f"Timings ({recorder.run}):\n{recorder.summary()}\n\n")
+        self.instructions_.config(state=tk.DISABLED)
+        recorder.flush()
+    
+    def __set_instructions(self, text):
+        """Replace the content of the instructions area"""
         self.instructions_.config(state=tk.NORMAL)
         self.instructions_.delete("1.0", tk.END)
-        iterations = int(self.input_entry_iterations.get())
-        instructions = lsystem.LSystem(custom_system=self.systems[self.selected_var.get()]).generate(iterations)
-        self.instructions_.insert(tk.END, instructions)
+        self.instructions_.insert(tk.END, text)
         self.instructions_.config(state=tk.DISABLED)
     
+    def __prepare_instructions(self, system, iterations, recorder, task=None):
+        """
+        Plan a system and, within the memory budget, generate it.
+        
+        Never touches Tk, so it can run on a background task; with a task the
+        generation advances one cached iteration at a time so it can be cancelled.
+        """
+        with recorder.stage("plan", iterations=iterations):
+            plan, summary = self.__plan_generation(system, iterations)
+        instructions = None
+        if plan == analysis.GENERATE:
+            with recorder.stage("generate", iterations=iterations) as record:
+                lsys = lsystem.LSystem(custom_system=system)
+                first = iterations if task is None else min(1, iterations)
+                for i in range(first, iterations + 1):
+                    instructions = self.generation_cache.generate(system, i, lsys)
+                    if task is not None:
+                        task.report(None, f"Generating... iteration {i}/{iterations}")
+                if instructions is None:
+                    instructions = self.generation_cache.generate(system, iterations, lsys)
+                record["symbols"] = len(instructions)
+        return plan, summary, instructions
+    
+    def __build_preview(self, instructions, recorder):
+        """Wrap generated instructions in a bounded preview and compute its stats (safe off the main thread)"""
+        if instructions is None:
+            return None
+        with recorder.stage("preview stats", symbols=len(instructions)):
+            instruction_preview = preview.InstructionPreview(instructions)
+            instruction_preview.stats()
+        return instruction_preview
+    
+    def __show_instructions(self, summary, instruction_preview, recorder, note="Instructions too large to preview."):
+        """Show the first preview page, or the predicted size when the instructions were not generated"""
+        self.preview = instruction_preview
+        if instruction_preview is None:
+            self.__set_instructions(note + "\n" + summary)
+            return
+        with recorder.stage("preview", symbols=min(instruction_preview.page_size, len(instruction_preview.instructions))):
+            self.__show_page(0)
+    
+    def __show_page(self, index):
+        """Show one page of the current preview; only that page ever reaches the Text widget"""
+        if self.preview is None:
+            return
+        self.preview_page = min(max(index, 0), self.preview.page_count - 1)
+        self.__set_instructions(self.preview.header(self.preview_page) + "\n\n" + self.preview.page(self.preview_page))
+    
+    def __export_instructions(self):
+        """Write the full previewed string to a text file in the animations folder"""
+        if self.preview is None:
+            self.status_label.config(text="Nothing to export: draw a system first")
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(utils.get_animations_dir(), f"{self.selected_var.get()}_{timestamp}.txt")
+        self.preview.export(path)
+        self.status_label.config(text=f"Instructions exported to {path}")
     
     def __export_custom_system(self):
         """Export the current custom system to a JSON file"""
@@ -98,174 +274,328 @@ class LSystemControlPanel:
         self.instructions_.insert(tk.END, f"Custom system exported to {filename}.")
         self.instructions_.config(state=tk.DISABLED)
     
+    def __load_systems(self):
+        """Refresh the catalog on a background thread, then list its systems"""
+        if self.catalog_task is not None and not self.catalog_task.finished:
+            return
+        self.status_label.config(text="Loading systems...")
+        self.catalog_task = worker.BackgroundTask(
+            self.new_win, self.__refresh_catalog, on_done=self.__show_systems,
+            on_error=lambda error: self.status_label.config(text=f"Loading systems failed: {error}")).start()
+    
+    def __refresh_catalog(self, task):
+        """
+        Background task: open the catalog on first use and rescan its folders.
+        
+        :return: (counts, working copies of the systems, errors); the panel edits its copies in place.
+        """
+        if self.catalog is None:
+            self.catalog = catalog.SystemCatalog([utils.get_examples_dir(), utils.get_custom_dir()])
+        counts = self.catalog.refresh()
+        return counts, copy.deepcopy(self.catalog.systems), self.catalog.errors()
+    
+    def __show_systems(self, result):
+        """Main thread: replace the listed systems with the freshly loaded ones"""
+        counts, loaded, errors = result
+        self.systems = loaded or {DEFAULT_SYSTEM_NAME: copy.deepcopy(DEFAULT_SYSTEM)}
+        self.__filter_systems()
+        self.selected_var.set(list(self.systems.keys())[0])
+        if self.task is None or self.task.finished:
+            # A running task keeps its own progress in the status and output in the instructions area
+            summary = (f"Loaded {len(loaded)} systems ({counts['added'] + counts['changed']} parsed, "
+                       f"{counts['unchanged']} from the index)")
+            if errors:
+                summary += f", skipped {len(errors)} invalid"
+                self.__set_instructions("Skipped invalid systems:\n" +
+                                        "\n".join(f"{path}: {error}" for path, error in errors))
+            self.status_label.config(text=summary)
+    
     def __update_systems(self):
-            """Update the list of available L-systems"""
-            # Use utility functions for path handling
-            example_systems = systems.load_systems_from_folder(utils.get_examples_dir()) 
-            custom_systems = systems.load_systems_from_folder(utils.get_custom_dir())
-            
-            if example_systems:
-                self.systems = example_systems
+        """Update the list of available L-systems"""
+        self.__load_systems()
+    
+    def __filter_systems(self, *args):
+        """Fill the OptionMenu with the systems whose name contains the filter text"""
+        pattern = self.filter_var.get().lower()
+        names = [name for name in self.systems if pattern in name.lower()]
+        menu = self.opt["menu"]
+        menu.delete(0, "end")
+        for system_name in names[:self.max_menu_entries]:
+            menu.add_command(label=system_name, command=lambda value=system_name: self.selected_var.set(value))
+        if len(names) > self.max_menu_entries:
+            menu.add_command(label=f"... {len(names) - self.max_menu_entries} more, type to filter", state=tk.DISABLED)
+        
+    
+    def __start_task(self, label, work, on_done):
+        """Run work on a background thread, reporting progress and allowing cancellation"""
+        if self.task is not None and not self.task.finished:
+            self.status_label.config(text="Busy: cancel the running task first")
+            return
+        
+        def finish(callback, *args):
+            self.progress_bar["value"] = 0
+            self.cancel_button.config(state=tk.DISABLED)
+            callback(*args)
+        
+        def on_progress(fraction, message):
+            if fraction is not None:
+                self.progress_bar["value"] = 100 * fraction
+            self.status_label.config(text=message)
+        
+        def on_error(error):
+            self.status_label.config(text="Failed")
+            if isinstance(error, ValueError):
+                self.__set_instructions("Invalid input! Please check your entries.")
             else:
-                self.systems = {}
-                
-            if custom_systems:
-                self.systems.update(custom_systems)
-                
-            if not self.systems:
-                self.systems = {"Custom": {
-                    "axiom": "F",
-                    "variables": {"var1": "F", "var2": "F"},
-                    "rules": {"r1": "F+F-F-F+F", "r2": ""},
-                    "settings": {"angle": 90, "distance": 5, "headingAngle": 0, "turnLeftStack": 0, "turnRightStack": 0},
-                    "goto": {"x": 0, "y": 0}
-                }}
-            
-            # Update the OptionMenu with the new systems
-            menu = self.opt["menu"]
-            menu.delete(0, "end")
-            for system_name in self.systems.keys():
-                menu.add_command(label=system_name, command=lambda value=system_name: self.selected_var.set(value))
-            self.selected_var.set(list(self.systems.keys())[0])
-            
+                self.__set_instructions(f"Error: {error}")
         
+        self.status_label.config(text=f"{label}...")
+        self.cancel_button.config(state=tk.NORMAL)
+        profile_path, self.profile_path = self.profile_path, None
+        self.task = worker.BackgroundTask(
+            self.new_win, work,
+            on_done=lambda result: finish(on_done, result),
+            on_error=lambda error: finish(on_error, error),
+            on_cancel=lambda: finish(self.status_label.config, {"text": f"{label} cancelled"}),
+            on_progress=on_progress,
+            profile_path=profile_path,
+        ).start()
+    
+    def __cancel_task(self):
+        """Ask the running background task to stop, or stop the drawing in progress"""
+        if self.task is not None and not self.task.finished:
+            self.task.cancel()
+            self.status_label.config(text="Cancelling...")
+        elif self.__cancel_drawing():
+            self.progress_bar["value"] = 0
+            self.cancel_button.config(state=tk.DISABLED)
+            self.status_label.config(text="Drawing cancelled")
+    
+    def __cancel_drawing(self):
+        """Stop the progressive drawing if one is running; returns whether one was"""
+        if self.drawing is None or self.drawing.finished or self.drawing.cancelled:
+            return False
+        self.drawing.cancel()
+        return True
     
-    def draw_lsystem(self, tracer=False):
-        """Update system from inputs, generate instructions, and draw the L-system"""
+    def draw_lsystem(self, tracer=False, message=None):
+        """Update system from inputs, then generate and walk it in the background and draw the result"""
         try:
             self.__create_system_from_input()
-            self.update_instructions()
-            # Clear the drawing and completely reset the turtle state
-            turtle.clearscreen()
-            turtle.resetscreen()  # This resets everything to default
-            
-            # Re-establish screen properties
-            screen = turtle.Screen()
-            screen.setup(width=800, height=600)
-            screen.title("L-System")
-            screen.bgcolor("white")
-            if tracer:
-                screen.tracer(0)
-            
-            selection = self.selected_var.get()
             iterations = int(self.input_entry_iterations.get())
-            lsys = lsystem.LSystem(custom_system=self.systems[selection])
-            instructions = lsys.generate(iterations)
-            lsys.draw(instructions)
-            turtle.update()  # Update the screen to show the complete drawing
-
         except ValueError:
-            self.instructions_.config(state=tk.NORMAL)
-            self.instructions_.delete("1.0", tk.END)
-            self.instructions_.insert(tk.END, "Invalid input! Please check your entries.")
-            self.instructions_.config(state=tk.DISABLED)
-            
+            self.__set_instructions("Invalid input! Please check your entries.")
+            return
+        
+        # The worker gets its own copy so edits in the panel cannot race with it
+        system = copy.deepcopy(self.systems[self.selected_var.get()])
+        fit = self.fit_var.get()
+        recorder = instrument.StageRecorder("draw", self.stage_log_path)
+        self.__start_task("Drawing",
+                          lambda task: self.__compute_drawing(task, system, iterations, fit, recorder),
+                          lambda result: self.__finish_drawing(result, tracer, recorder, message))
+    
+    def __compute_drawing(self, task, system, iterations, fit, recorder):
+        """Background task: plan, generate and walk the system into segment arrays for the screen"""
+        lsys = lsystem.LSystem(custom_system=system)
+        total = analysis.GrowthAnalyzer(lsys).segments(iterations)
+        cached = self.geometry_cache.get(system, iterations) if total >= self.geometry_cache.min_segments else None
+        if cached is not None:
+            # Memory-mapped from an earlier session: nothing to generate, and drawing it
+            # costs too little for the segment budget to apply
+            with recorder.stage("plan", iterations=iterations):
+                _, summary = self.__plan_generation(system, iterations)
+            plan, instructions = analysis.STREAM, None
+            note = "Drawn from the geometry cache, so the instructions were not generated."
+        else:
+            plan, summary, instructions = self.__prepare_instructions(system, iterations, recorder, task)
+            note = "Instructions too large to preview."
+        result = {"system": system, "plan": plan, "summary": summary, "note": note, "segments": [],
+                  "preview": self.__build_preview(instructions, recorder)}
+        if plan == analysis.REFUSE:
+            return result
+        
+        with recorder.stage("geometry", iterations=iterations) as record:
+            if cached is not None:
+                # Only the pages drawn are read
+                record["cached"] = True
+                step = self.progress_chunk_size
+                chunks = (cached[start:start + step] for start in range(0, len(cached), step))
+            else:
+                try:
+                    # Compose memoized blocks instead of walking every symbol, when the rules allow it
+                    chunks = instancing.InstancedGeometry(lsys, iterations).iter_segments(self.progress_chunk_size)
+                except ValueError:
+                    walker = geometry.TurtleWalker(lsys.lSystem)
+                    # Stream the symbols when they were too large to generate
+                    source = instructions if instructions is not None else lsys.iter_chunks(iterations)
+                    chunks = (walker.walk(chunk)
+                              for chunk in geometry.iter_text_chunks(source, self.progress_chunk_size))
+                if total >= self.geometry_cache.min_segments:
+                    chunks = self.geometry_cache.iter_store(system, iterations, chunks)
+            done = 0
+            for chunk in chunks:
+                result["segments"].append(chunk)
+                done += len(result["segments"][-1])
+                task.report(done / total if total else None, f"Computing geometry... {done}/{total} segments")
+            record["segments"] = done
+        
+        # Fit to the window, then drop what is off screen, below a pixel or drawn twice
+        with recorder.stage("viewport") as record:
+            if fit:
+                view = viewport.Viewport.fit(viewport.segment_bounds(result["segments"]),
+                                             self.screen_width, self.screen_height)
+            else:
+                view = viewport.Viewport(self.screen_width, self.screen_height)
+            segments = list(view.prepare(result.pop("segments")))
+            result["segment_count"] = record["segments"] = sum(len(chunk) for chunk in segments)
+        
+        # Merge into polylines cut into pieces small enough to draw within one tick
+        task.report(None, "Merging polylines...")
+        with recorder.stage("coalesce") as record:
+            result["pieces"] = progressive.prepare_pieces(segments, self.piece_points, check=task.check_cancelled)
+            record["pieces"] = len(result["pieces"])
+        result["end"] = tuple(segments[-1][-1, 2:].tolist()) if segments else None
+        return result
+    
+    def __finish_drawing(self, result, tracer, recorder, message=None):
+        """Main thread: show the preview and hand the computed segments to turtle"""
+        if result["plan"] == analysis.REFUSE:
+            self.status_label.config(text="Refused")
+            self.__set_instructions("Drawing refused: over the segment budget.\n" + result["summary"])
+            return
+        self.__show_instructions(result["summary"], result["preview"], recorder, result["note"])
+        
+        # Stop a drawing still in progress before its canvas is cleared
+        self.__cancel_drawing()
+        
+        # Clear the drawing and completely reset the turtle state
+        turtle.clearscreen()
+        turtle.resetscreen()  # This resets everything to default
+        
+        # Re-establish screen properties
+        screen = turtle.Screen()
+        screen.setup(width=self.screen_width, height=self.screen_height)
+        screen.title("L-System")
+        screen.bgcolor("white")
+        if tracer:
+            screen.tracer(0)
+        
+        lsys = lsystem.LSystem(custom_system=result["system"])
+        t = lsys.create_turtle()
+        color, width = lsys.canvas_pen(t)
+        started = time.perf_counter()
+        
+        def on_progress(done, total):
+            if self.drawing.ticks == 1:
+                recorder.add("first frame", time.perf_counter() - started)
+            if total:
+                self.progress_bar["value"] = 100 * done / total
+            self.status_label.config(text=f"Drawing... {done}/{total} pieces")
+        
+        def on_done():
+            recorder.add("draw", time.perf_counter() - started, segments=result["segment_count"],
+                         pieces=len(result["pieces"]), ticks=self.drawing.ticks)
+            if result["end"] is not None:
+                t.penup()
+                t.goto(*result["end"])
+                t.pendown()
+            with recorder.stage("screen update"):
+                turtle.update()  # Update the screen to show the complete drawing
+            self.progress_bar["value"] = 0
+            self.cancel_button.config(state=tk.DISABLED)
+            self.__show_timings(recorder)
+            if message:
+                self.instructions_.config(state=tk.NORMAL)
+                self.instructions_.insert("1.0", message + "\n\n")
+                self.instructions_.config(state=tk.DISABLED)
+            self.status_label.config(text="Done")
+        
+        # Lines are created a budget's worth per frame, so the drawing shows up at once,
+        # fills in gradually and the windows stay responsive; fast mode spends more per frame
+        self.cancel_button.config(state=tk.NORMAL)
+        self.drawing = progressive.ProgressiveDrawing(
+            self.new_win, screen.getcanvas(), result["pieces"], color, width,
+            frame_rate=self.frame_rate, budget_ms=self.fast_budget_ms if tracer else self.draw_budget_ms,
+            on_progress=on_progress, on_done=on_done).start()
             
     def __animate_lsystem(self):
-        """Generate an animated GIF showing the evolution of the L-system"""
+        """Generate an animated GIF showing the evolution of the L-system in the background"""
         try:
-            # Get proper path to the root animations folder using utils
-            animations_dir = utils.get_animations_dir()
-            
-            # Create a temporary directory for frames
-            temp_dir = os.path.join(animations_dir, "temp")
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            # Get system configuration from input fields
             custom_system = self.__create_system_from_input()
             max_iterations = int(self.input_entry_iterations.get())
-            
-            # Generate timestamp for unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            system_name = self.selected_var.get()
-            
-            # Prepare for animation capture
-            frame_files = []
-            
-            # Update UI to show progress
-            self.instructions_.config(state=tk.NORMAL)
-            self.instructions_.delete("1.0", tk.END)
-            self.instructions_.insert(tk.END, "Creating animation frames...\n")
-            self.instructions_.config(state=tk.DISABLED)
-            self.root.update()
-            
-            # For each iteration level, generate a frame
-            for i in range(1, max_iterations + 1):
-                # Clear the turtle screen
-                turtle.clearscreen()
-                turtle.resetscreen()
-                
-                # Configure the turtle screen
-                screen = turtle.Screen()
-                screen.setup(width=800, height=600)
-                screen.title(f"L-System Animation (Iteration {i})")
-                screen.bgcolor("white")
-                screen.tracer(0)  # Turn off animation for faster drawing
-                
-                # Create and configure turtle
-                t = turtle.Turtle()
-                t.speed(0)
-                t.hideturtle()
-                
-                # Generate L-system at current iteration level
-                lsys = lsystem.LSystem(custom_system=custom_system)
-                instructions = lsys.generate(i)
-                
-                # Draw the L-system
-                lsys.draw(instructions)
-                turtle.update()
-                
-                # Save the frame
-                # First save as EPS since PostScript works better with turtle
-                eps_path = os.path.join(animations_dir, "temp.eps")
-                canvas = turtle.getcanvas()
-                canvas.postscript(file=eps_path)
-                
-                # Convert EPS to PNG
-                img = Image.open(eps_path)
-                png_path = os.path.join(temp_dir, f"frame_{i:03d}.png")
-                img.save(png_path)
-                img.close()
-                frame_files.append(png_path)
-                
-                # Update progress
-                self.instructions_.config(state=tk.NORMAL)
-                self.instructions_.delete("1.0", tk.END)
-                self.instructions_.insert(tk.END, f"Creating animation... {i}/{max_iterations}\n")
-                self.instructions_.config(state=tk.DISABLED)
-                self.root.update()
-            
-            # Create the animated GIF
-            if frame_files:
-                output_gif = os.path.join(animations_dir, f"{system_name}_{timestamp}.gif")
-                gif.create_animated_gif(frame_files, output_gif, duration=500)
-                
-                # Update UI with success message
-                self.instructions_.config(state=tk.NORMAL)
-                self.instructions_.delete("1.0", tk.END)
-                self.instructions_.insert(tk.END, f"Animation saved as {output_gif}")
-                self.instructions_.config(state=tk.DISABLED)
-                
-                # Clean up temporary EPS file
-                try:
-                    os.remove(eps_path)
-                except:
-                    pass
-                    
-                # Optionally remove the temp directory
-                try:
-                    os.rmdir(temp_dir)
-                except:
-                    pass
-                    
-                # Redraw the final result
-                self.draw_lsystem(tracer=True)
-                
-        except Exception as e:
-            self.instructions_.config(state=tk.NORMAL)
-            self.instructions_.delete("1.0", tk.END)
-            self.instructions_.insert(tk.END, f"Error creating animation: {str(e)}")
-            self.instructions_.config(state=tk.DISABLED)    
+        except ValueError:
+            self.__set_instructions("Invalid input! Please check your entries.")
+            return
+        
+        # Get proper path to the root animations folder using utils
+        animations_dir = utils.get_animations_dir()
+        
+        # Generate timestamp for unique filename
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        system_name = self.selected_var.get()
+        output_gif = os.path.join(animations_dir, f"{system_name}_{timestamp}.gif")
+        
+        system = copy.deepcopy(custom_system)
+        options = {"width": self.screen_width, "height": self.screen_height, "fit": self.fit_var.get()}
+        recorder = instrument.StageRecorder("animate", self.stage_log_path)
+        self.__start_task("Animating",
+                          lambda task: self.__compute_animation(task, system, max_iterations, output_gif,
+                                                                options, recorder),
+                          lambda result: self.__finish_animation(result, recorder))
+    
+    def __compute_animation(self, task, system, max_iterations, output_gif, options, recorder):
+        """Background task: render every frame headlessly and stream them into the GIF"""
+        from . import gif  # Pillow and the frame pool are only imported once an animation is made
+        
+        # The last frame is the largest one, so checking it covers the whole animation
+        with recorder.stage("plan", iterations=max_iterations):
+            plan, summary = self.__plan_generation(system, max_iterations)
+        if plan == analysis.REFUSE or max_iterations <= 0:
+            return {"output_gif": None, "summary": summary}
+        
+        def frames_with_progress():
+            """Pass frames through to the GIF writer while reporting progress"""
+            frames = gif.iter_frames(system, max_iterations,
+                                     workers=self.animation_workers,
+                                     stream=plan == analysis.STREAM,
+                                     cache=self.generation_cache,
+                                     recorder=recorder,
+                                     palette=palette,
+                                     **options)
+            try:
+                for i, frame in enumerate(frames, start=1):
+                    yield frame
+                    task.report(i / max_iterations, f"Creating animation... {i}/{max_iterations}")
+            finally:
+                frames.close()
+        
+        # Frames are rendered headlessly (in parallel when workers > 1) and
+        # streamed straight into the GIF as delta frames on one shared palette
+        palette = gif.frame_palette(options)
+        try:
+            with recorder.stage("animation total", frames=max_iterations):
+                gif.write_animation(frames_with_progress(), output_gif, duration=500, palette=palette,
+                                    recorder=recorder)
+        except BaseException:
+            # Do not leave a truncated GIF behind when cancelled or failed
+            if os.path.exists(output_gif):
+                os.remove(output_gif)
+            raise
+        return {"output_gif": output_gif, "summary": summary}
+    
+    def __finish_animation(self, result, recorder):
+        """Main thread: report the saved animation and redraw the final iteration"""
+        if result["output_gif"] is None:
+            self.status_label.config(text="Refused")
+            self.__set_instructions("Animation refused: over the segment budget.\n" + result["summary"])
+            return
+        recorder.flush()
+        message = (f"Animation saved as {result['output_gif']}\n\n"
+                   f"Timings ({recorder.run}):\n{recorder.summary()}")
+        
+        # Redraw the final result
+        self.draw_lsystem(tracer=True, message=message)
             
     def __update_mode_display(self, *args):
         """Update the display label based on the slider value"""
@@ -279,6 +609,16 @@ class LSystemControlPanel:
 
     def __process_based_on_mode(self):
         """Execute the appropriate function based on the slider value"""
+        if self.profile_var.get():
+            # Capture a cProfile dump of the background task started by this run
+            self.profile_var.set(False)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.profile_path = os.path.join(self.profile_dir, f"profile_{timestamp}.prof")
+            self.status_label.config(text=f"Profiling to {self.profile_path}")
+        self.__run_mode()
+    
+    def __run_mode(self):
+        """Run the drawing or animation selected by the slider"""
         mode = int(self.mode_slider.get())
         if mode == 1:
             # Normal drawing
@@ -295,7 +635,14 @@ class LSystemControlPanel:
         # OptionMenu for selecting the L-system
         self.opt = tk.OptionMenu(self.new_win, self.selected_var, *self.systems.keys())
         self.opt.config(width=20, font=("Arial", 12))
-        self.opt.grid(row=0, column=0, padx=5, pady=5, sticky=tk.W+tk.E, columnspan=4)
+        self.opt.grid(row=0, column=0, padx=5, pady=5, sticky=tk.W+tk.E, columnspan=3)
+        
+        # Filter for the OptionMenu; long catalogs only list the first matches
+        self.filter_var = tk.StringVar(self.new_win)
+        filter_entry = tk.Entry(self.new_win, textvariable=self.filter_var, width=12)
+        filter_entry.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W+tk.E)
+        self.filter_var.trace_add("write", self.__filter_systems)
+        self.__filter_systems()
         
         # Number of iterations
         input_label_iterations = tk.Label(self.new_win, text="Iterations:")
@@ -317,6 +664,14 @@ class LSystemControlPanel:
         # Rules
         self.input_text_rule1 = self.__create_input(self.new_win, "Rule 1:", "rules", "r1", column=0, row=5)
         self.input_text_rule2 = self.__create_input(self.new_win, "Rule 2:", "rules", "r2", column=0, row=6)
+        
+        # Productions keyed on single symbols, e.g. "A=B-A-B; B=A+B+A"
+        productions_label = tk.Label(self.new_win, text="Productions:")
+        productions_label.grid(row=7, column=0, padx=5, pady=5)
+        self.input_text_productions = tk.Text(self.new_win, height=1, width=20)
+        self.input_text_productions.grid(row=7, column=1, padx=5, pady=5)
+        self.__set_text(self.input_text_productions,
+                        self.__format_productions(self.systems[self.selected_var.get()]["rules"]))
 
         
         # export custom system button
@@ -339,29 +694,46 @@ class LSystemControlPanel:
         self.input_text_goto_x = self.__create_input(self.new_win, "Goto X:", "goto", "x", column=2, row=6)
         self.input_text_goto_y = self.__create_input(self.new_win, "Goto Y:", "goto", "y", column=2, row=7)
         
-        # Bind the update function to selection changes
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_axiom, parameter1="axiom"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_var1, parameter1="variables", parameter2="var1"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_var2, parameter1="variables", parameter2="var2"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_rule1, parameter1="rules", parameter2="r1"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_rule2, parameter1="rules", parameter2="r2"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_angle, parameter1="settings", parameter2="angle"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_distance, parameter1="settings", parameter2="distance"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_headingAngle, parameter1="settings", parameter2="headingAngle"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_turnLeftStack, parameter1="settings", parameter2="turnLeftStack"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_turnRightStack, parameter1="settings", parameter2="turnRightStack"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_goto_x, parameter1="goto", parameter2="x"))
-        self.selected_var.trace_add("write", lambda *args: self.__update_text(text_input=self.input_text_goto_y, parameter1="goto", parameter2="y"))
+        # One batched refresh of every field per selection change
+        self.selected_var.trace_add("write", self.__schedule_fields_update)
         
         # Generate instructions area
         instructions_label = tk.Label(self.new_win, text="Instructions:")
         instructions_label.grid(row=10, column=0, padx=5, pady=5)
         
+        # Capture a cProfile dump of the next draw or animation
+        self.profile_var = tk.BooleanVar(self.new_win, value=False)
+        profile_check = tk.Checkbutton(self.new_win, text="Profile next run", variable=self.profile_var)
+        profile_check.grid(row=10, column=2, padx=5, pady=5, columnspan=2, sticky=tk.E)
+        
+        # Scale and center drawings and animation frames to the window
+        self.fit_var = tk.BooleanVar(self.new_win, value=True)
+        fit_check = tk.Checkbutton(self.new_win, text="Fit to window", variable=self.fit_var)
+        fit_check.grid(row=10, column=1, padx=5, pady=5)
+        
         self.instructions_ = tk.Text(self.new_win, height=10, width=50)
         self.instructions_.grid(row=11, column=0, columnspan=4, padx=5, pady=5, sticky=tk.W+tk.E)
         self.instructions_.insert(tk.END, "Instructions will be generated here.")
         self.instructions_.config(state=tk.DISABLED)
         
+        # Progress of the background draw or animation, with a button to cancel it
+        self.progress_bar = ttk.Progressbar(self.new_win, mode="determinate", maximum=100)
+        self.progress_bar.grid(row=12, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W+tk.E)
+        self.status_label = tk.Label(self.new_win, text="Ready", anchor=tk.W)
+        self.status_label.grid(row=12, column=2, padx=5, pady=5, sticky=tk.W+tk.E)
+        self.cancel_button = tk.Button(self.new_win, text="Cancel", command=self.__cancel_task, state=tk.DISABLED)
+        self.cancel_button.grid(row=12, column=3, padx=5, pady=5, sticky=tk.E)
+        
+        # Page through the instructions preview, or export the full string
+        preview_frame = tk.Frame(self.new_win)
+        preview_frame.grid(row=13, column=0, columnspan=4, padx=5, pady=5, sticky=tk.W+tk.E)
+        for text, command in (("Head", lambda: self.__show_page(0)),
+                              ("< Prev", lambda: self.__show_page(self.preview_page - 1)),
+                              ("Next >", lambda: self.__show_page(self.preview_page + 1)),
+                              ("Tail", lambda: self.__show_page(self.preview.page_count - 1 if self.preview else 0))):
+            tk.Button(preview_frame, text=text, command=command).pack(side=tk.LEFT, padx=2)
+        tk.Button(preview_frame, text="Export Instructions", command=self.__export_instructions).pack(side=tk.RIGHT, padx=2)
+        
         # Create a frame for the slider and its label
         slider_frame = tk.Frame(self.new_win)
         slider_frame.grid(row=8, column=2, columnspan=2, padx=5, pady=5, sticky=tk.W+tk.E)
@@ -0,0 +1,290 @@
+import numpy as np
+
+# Symbol classes used by the vectorized turtle walk
+OTHER, FORWARD, TURN_RIGHT, TURN_LEFT, TURN_AROUND, PUSH, POP = range(7)
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Precision (in turtle units) at which coalesce_polylines treats two points as the same
+COALESCE_DECIMALS = 6
+
+
+def iter_text_chunks(instructions, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Yield instructions as strings of roughly chunk_size symbols.
+
+    :param instructions: A string, or any iterable of strings (single symbols or
+                         chunks, e.g. LSystem.iter_symbols or LSystem.iter_chunks).
+    :param chunk_size: Number of symbols per yielded chunk.
+    """
+    if isinstance(instructions, str):
+        for start in range(0, len(instructions), chunk_size):
+            yield instructions[start:start + chunk_size]
+        return
+
+    pending = []
+    size = 0
+    for piece in instructions:
+        pending.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield "".join(pending)
+
+
+class TurtleWalker:
+    def __init__(self, lsystem_dict: dict):
+        """
+        Headless, vectorized equivalent of the turtle walk in LSystem.draw.
+
+        Symbols are fed in chunks; each chunk is turned into an (N, 4) array of
+        segments [x0, y0, x1, y1]. Position, heading and the bracket stack carry
+        over between chunks, so a stream can be walked in bounded memory.
+        """
+        settings = lsystem_dict["settings"]
+        variables = lsystem_dict["variables"]
+        self.angle = float(settings["angle"])
+        self.distance = float(settings["distance"])
+        self.turn_left_stack = float(settings["turnLeftStack"])
+        self.turn_right_stack = float(settings["turnRightStack"])
+
+        self.heading = float(settings["headingAngle"])
+        self.position = np.array([float(lsystem_dict["goto"]["x"]), float(lsystem_dict["goto"]["y"])])
+        self.stack = np.empty((0, 3))  # saved (x, y, heading) rows, innermost last
+
+        # Symbol class per code point; var2 is checked last like the elif chain in draw()
+        self.__classes = {ord('+'): TURN_RIGHT, ord('-'): TURN_LEFT, ord('|'): TURN_AROUND,
+                          ord('['): PUSH, ord(']'): POP}
+        for var in (variables["var2"], variables["var1"]):
+            if len(var) == 1:
+                self.__classes[ord(var)] = FORWARD
+        # Heading change per symbol class, and as seen from the enclosing bracket pair
+        self.__turns = np.array([0.0, 0.0, -self.angle, self.angle, -180.0, self.turn_left_stack, 0.0])
+        self.__parent_turns = np.array([0.0, 0.0, -self.angle, self.angle, -180.0, 0.0, -self.turn_right_stack])
+
+        self.__byte_classes = np.zeros(256, dtype=np.int8)
+        for code, symbol_class in self.__classes.items():
+            if code < 256:
+                self.__byte_classes[code] = symbol_class
+
+    def classify(self, chunk: str) -> np.ndarray:
+        """Map a string of symbols to an int8 array of symbol classes"""
+        try:
+            return self.__byte_classes[np.frombuffer(chunk.encode("latin-1"), dtype=np.uint8)]
+        except UnicodeEncodeError:
+            codes = np.frombuffer(chunk.encode("utf-32-le"), dtype=np.uint32)
+            kinds = np.zeros(len(codes), dtype=np.int8)
+            for code, symbol_class in self.__classes.items():
+                kinds[codes == code] = symbol_class
+            return kinds
+
+    @staticmethod
+    def __level_index(levels):
+        """
+        Sort symbols by nesting level, keeping their order within a level.
+
+        Symbols one level deeper than a bracket pair, between its '[' and ']', are exactly
+        the ones belonging to that pair (nested pairs contribute through their own ']'),
+        and this ordering keeps them contiguous.
+        """
+        base = levels.min()
+        shifted = levels - base
+        order = np.argsort(shifted.astype(np.int16 if shifted.max() < 2 ** 15 else np.int64), kind="stable")
+        width = len(levels) + 1
+        return order, shifted[order] * width + order, base, width
+
+    @staticmethod
+    def __inner_sums(index, levels, values, opens, closes):
+        """Sum values over the symbols directly inside each bracket pair (see __level_index)"""
+        order, sorted_keys, base, width = index
+        cumulative = np.concatenate(([0.0], np.cumsum(values[order])))
+        inner = (levels[opens] - base + 1) * width
+        lo = np.searchsorted(sorted_keys, inner + opens, side="right")
+        hi = np.searchsorted(sorted_keys, inner + closes, side="left")
+        return cumulative[hi] - cumulative[lo]
+
+    @staticmethod
+    def __cumsum_with_resets(deltas, resets, targets, start):
+        """Cumulative sum from start, jumping to targets[i] at every index in resets"""
+        totals = np.cumsum(deltas)
+        if len(resets) == 0:
+            return totals + start
+        marker = np.full(len(deltas), -1)
+        marker[resets] = resets
+        last = np.maximum.accumulate(marker)
+        anchor = np.empty_like(totals)
+        anchor[resets] = targets - totals[resets]
+        return np.where(last >= 0, anchor[np.maximum(last, 0)], start) + totals
+
+    def walk(self, chunk: str) -> np.ndarray:
+        """Advance the turtle over a chunk of symbols and return the segments it draws"""
+        kinds = self.classify(chunk)
+        kinds = kinds[kinds != OTHER]  # symbols draw() ignores never change the state
+        n = len(kinds)
+        if n == 0:
+            return np.empty((0, 4))
+        is_push = kinds == PUSH
+        is_pop = kinds == POP
+        saved = len(self.stack)
+
+        # A ']' on an empty stack is ignored by draw(): it is exactly a pop that sets a
+        # new minimum below zero in the absolute stack depth
+        depth = np.cumsum(is_push.astype(np.int64) - is_pop)
+        lowest = np.minimum.accumulate(np.concatenate(([saved], saved + depth)))[:-1]
+        ignored = is_pop & (saved + depth < lowest) & (saved + depth < 0)
+        if ignored.any():
+            is_pop &= ~ignored
+            depth = np.cumsum(is_push.astype(np.int64) - is_pop)
+
+        # Pops that go below anything pushed in this chunk restore a state saved earlier
+        lowest_local = np.minimum.accumulate(np.concatenate(([0], depth)))[:-1]
+        carried = is_pop & (depth < lowest_local)
+        local_pop = is_pop & ~carried
+
+        # Nesting level of every symbol; a bracket pair sits on the level of its parent
+        levels = depth - is_push
+
+        # Pair every '[' with its ']' in this chunk: per level they alternate in order
+        brackets = np.flatnonzero(is_push | local_pop)
+        order = brackets[np.argsort(levels[brackets], kind="stable")]
+        paired = np.zeros(len(order), dtype=bool)
+        if len(order) > 1:
+            paired[:-1] = is_push[order[:-1]] & local_pop[order[1:]] & (levels[order[:-1]] == levels[order[1:]])
+        opens = order[paired]
+        closes = order[np.flatnonzero(paired) + 1]
+
+        # Headings: turns accumulate, '[' turns left, and a ']' undoes everything since
+        # its '[' before turning right. From its parent's point of view a closed pair
+        # only contributes the final right turn.
+        heading_deltas = self.__turns[kinds]
+        parent_view = self.__parent_turns[kinds]
+        parent_view[ignored | carried] = 0.0
+        if len(closes):
+            index = self.__level_index(levels)
+            heading_deltas[closes] = (-self.turn_left_stack - self.turn_right_stack
+                                      - self.__inner_sums(index, levels, parent_view, opens, closes))
+        heading_deltas[carried] = 0.0
+        resets = np.flatnonzero(carried)
+        stack_rows = self.stack[saved + depth[resets]] if len(resets) else np.empty((0, 3))
+        headings = self.__cumsum_with_resets(heading_deltas, resets,
+                                             stack_rows[:, 2] - self.turn_right_stack, self.heading)
+
+        # Positions: forward moves step along the heading, a ']' steps back to its '['
+        is_forward = kinds == FORWARD
+        radians = np.deg2rad(np.mod(headings, 360.0))
+        coordinates = []
+        for axis, trig in enumerate((np.cos, np.sin)):
+            steps = np.where(is_forward, self.distance * trig(radians), 0.0)
+            if len(closes):
+                steps[closes] = -self.__inner_sums(index, levels, steps, opens, closes)
+            coordinates.append(self.__cumsum_with_resets(steps, resets, stack_rows[:, axis], self.position[axis]))
+        x, y = coordinates
+        previous_x = np.concatenate(([self.position[0]], x[:-1]))
+        previous_y = np.concatenate(([self.position[1]], y[:-1]))
+        previous_headings = np.concatenate(([self.heading], headings[:-1]))
+
+        # Carry the state over to the next chunk
+        unclosed = np.setdiff1d(np.flatnonzero(is_push), opens, assume_unique=True)
+        kept = saved + min(0, int(depth.min()))
+        self.stack = np.concatenate((
+            self.stack[:kept],
+            np.column_stack((previous_x[unclosed], previous_y[unclosed], previous_headings[unclosed])),
+        ))
+        self.heading = float(headings[-1])
+        self.position = np.array([x[-1], y[-1]])
+
+        return np.column_stack((previous_x[is_forward], previous_y[is_forward], x[is_forward], y[is_forward]))
+
+
+def iter_segment_chunks(lsystem_dict: dict, instructions, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Lazily yield (N, 4) segment arrays for a string or stream of instructions.
+
+    :param lsystem_dict: L-system definition (settings, variables and goto are used).
+    :param instructions: A string or an iterable of strings.
+    :param chunk_size: Number of symbols walked per yielded array.
+    """
+    walker = TurtleWalker(lsystem_dict)
+    for chunk in iter_text_chunks(instructions, chunk_size):
+        yield walker.walk(chunk)
+
+
+def compute_segments(lsystem_dict: dict, instructions, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    """
+    Compute every segment LSystem.draw would draw, without touching turtle.
+
+    :return: Array of shape (N, 4) holding [x0, y0, x1, y1] per segment.
+    """
+    chunks = list(iter_segment_chunks(lsystem_dict, instructions, chunk_size))
+    if not chunks:
+        return np.empty((0, 4))
+    return np.concatenate(chunks)
+
+
+def iter_polylines(segments: np.ndarray):
+    """
+    Split segments into runs where each segment starts where the previous one ended.
+
+    :param segments: Array of shape (N, 4) from compute_segments.
+    :return: Iterator of (K, 2) point arrays, one per connected polyline.
+    """
+    if len(segments) == 0:
+        return
+    breaks = np.flatnonzero(np.any(segments[1:, :2] != segments[:-1, 2:], axis=1)) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(segments)]))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        run = segments[start:end]
+        yield np.concatenate((run[:1, :2], run[:, 2:]))
+
+
+def coalesce_polylines(segments: np.ndarray, check=None) -> list:
+    """
+    Merge segments into as few drawable polylines as possible.
+
+    Connected runs from iter_polylines are joined across '[' / ']' breaks when the
+    restored position lies on the path walked so far: the polyline retraces that
+    path back to it, drawing over lines it already drew, so the picture does not
+    change. Every point is retraced at most once, so the output is at most twice
+    the size of the input. Anything else (e.g. a jump to an unvisited point) starts
+    a new polyline. Points are compared after rounding to COALESCE_DECIMALS, since a
+    restored position can differ from the pushed one by float rounding in the walk.
+
+    :param segments: Array of shape (N, 4) from compute_segments.
+    :param check: Optional callable run before every connected run, e.g. a task's
+                  check_cancelled, so long merges can be interrupted.
+    :return: List of flat [x0, y0, x1, y1, ...] coordinate lists, one per polyline.
+    """
+    polylines = []
+    coords = None
+    path = []    # Points from the start of the current polyline to its end, without retraced parts
+    where = {}   # Point -> index of its latest occurrence in path
+    for run in iter_polylines(segments):
+        if check is not None:
+            check()
+        run = np.round(run, COALESCE_DECIMALS)
+        points = list(map(tuple, run.tolist()))
+        start = points[0]
+        if coords is not None and start != path[-1]:
+            index = where.get(start)
+            if index is None:
+                coords = None
+            else:
+                # Walk back over the path to the restored position
+                coords.extend(value for point in reversed(path[index:-1]) for value in point)
+                for i in range(index + 1, len(path)):
+                    if where.get(path[i]) == i:
+                        del where[path[i]]
+                del path[index + 1:]
+        if coords is None:
+            coords = list(start)
+            polylines.append(coords)
+            path = [start]
+            where = {start: 0}
+        where.update(zip(points[1:], range(len(path), len(path) + len(points) - 1)))
+        path.extend(points[1:])
+        coords.extend(run[1:].ravel().tolist())
+    return polylines
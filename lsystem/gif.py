@@ -1,37 +1,340 @@
 import os
-from PIL import Image
-from datetime import datetime
-import turtle
-def create_animated_gif(frame_files, output_gif, duration=500):
+import io
+import struct
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageColor
+from . import analysis
+from . import geometry
+from . import instrument
+from . import lsystem
+from . import raster
+from . import utils
+
+# Ramp colors of the shared palette for anti-aliased (supersampled) frames
+DEFAULT_LEVELS = 15
+
+ANIMATION_FORMATS = ("gif", "apng", "webp")
+
+# Animations drawing fewer segments than this over all frames are rendered in
+# this process: starting the worker processes would cost more than it saves
+PARALLEL_MIN_SEGMENTS = 500_000
+
+
+def split_frame(data: bytes):
     """
-    Create an animated GIF from a list of image files.
-    
+    Split a one-frame GIF saved by Pillow into its color table and image block.
+
+    Returns the color table size bits, the color table and the image block
+    (descriptor plus LZW data) without any extensions or the trailer.
+    """
+    packed = data[10]
+    size_bits = packed & 0x07
+    table_size = 3 * 2 ** (size_bits + 1) if packed & 0x80 else 0
+    table = data[13:13 + table_size]
+    block = data[13 + table_size:-1]
+
+    # Skip extension blocks ('!' label, then length-prefixed sub-blocks)
+    while block[0] == 0x21:
+        position = 2
+        while block[position]:
+            position += block[position] + 1
+        block = block[position + 1:]
+    return size_bits, table, block
+
+
+class LinePalette:
+    def __init__(self, background="white", color="black", levels=DEFAULT_LEVELS):
+        """
+        One palette shared by every frame of a line drawing.
+
+        The drawings only hold the background, the line color and (when
+        supersampled) the anti-aliased blends between them, so a ramp of levels
+        colors from background to color covers every frame up front. One extra
+        index is kept as the transparent color of delta frames.
+
+        Args:
+            background: Background color, as accepted by Pillow
+            color: Line color, as accepted by Pillow
+            levels: Number of ramp colors, at least 2
+        """
+        self.levels = max(2, min(255, int(levels)))
+        self.background = np.array(ImageColor.getrgb(background)[:3], dtype=np.float32)
+        self.color = np.array(ImageColor.getrgb(color)[:3], dtype=np.float32)
+        self.transparent = self.levels
+        self.size_bits = self.levels.bit_length() - 1  # The table holds 2 ** (size_bits + 1) colors
+        ramp = np.linspace(0.0, 1.0, self.levels)[:, None]
+        colors = np.round(self.background + ramp * (self.color - self.background)).astype(np.uint8)
+        table = bytearray(colors.tobytes())
+        table += bytes(3 * 2 ** (self.size_bits + 1) - len(table))
+        self.table = bytes(table)
+
+    def quantize(self, image: Image.Image) -> np.ndarray:
+        """
+        Map an RGB frame onto the ramp.
+
+        Args:
+            image: Frame drawn with this palette's background and color
+
+        Returns:
+            Array of palette indices with the frame's height and width
+        """
+        direction = self.color - self.background
+        length = float(direction @ direction)
+        if length == 0:
+            return np.zeros((image.height, image.width), dtype=np.uint8)
+        pixels = np.asarray(image.convert("RGB"), dtype=np.float32)
+        position = ((pixels - self.background) @ direction) / length
+        return np.clip(np.rint(position * (self.levels - 1)), 0, self.levels - 1).astype(np.uint8)
+
+    def image(self, indices: np.ndarray) -> Image.Image:
+        """Palette image of an index array from quantize"""
+        image = Image.fromarray(indices, mode="P")
+        image.putpalette(self.table)
+        return image
+
+    def frame(self, image: Image.Image) -> Image.Image:
+        """Quantize an RGB frame into a palette image"""
+        return self.image(self.quantize(image))
+
+
+def frame_palette(options: dict) -> LinePalette:
+    """The shared palette for frames rendered with raster.render_image options"""
+    levels = DEFAULT_LEVELS if options.get("supersample", 1) > 1 else 2
+    return LinePalette(options.get("background", "white"), options.get("color", "black"), levels)
+
+
+def _render_frames(system, first, last, stream, options, palette):
+    """Worker entry point: render and quantize the frames first..last of a system"""
+    if stream:
+        return [palette.frame(raster.render_system(system, i, **options)) for i in range(first, last + 1)]
+    lsys = lsystem.LSystem(custom_system=system)
+    return [palette.frame(raster.render_image(geometry.compute_segments(lsys.lSystem, instructions), **options))
+            for _, instructions in lsys.iter_generations(last, start=first)]
+
+
+def split_iterations(weights, parts: int):
+    """
+    Split the frames 1..len(weights) into at most parts contiguous ranges of similar weight.
+
+    Frames usually grow geometrically, so the ranges are cut from the last frame
+    down: the largest frames get a range of their own and the small early ones
+    are grouped together.
+
+    :param weights: Estimated cost of every frame, first frame first.
+    :param parts: Largest number of ranges.
+    :return: List of (first, last) iteration ranges in order.
+    """
+    ranges = []
+    remaining = sum(weights)
+    last = len(weights)
+    size = 0
+    for i in range(len(weights), 0, -1):
+        size += weights[i - 1]
+        if i == 1 or (len(ranges) < parts - 1 and size * (parts - len(ranges)) >= remaining):
+            ranges.append((i, last))
+            remaining -= size
+            last = i - 1
+            size = 0
+    return ranges[::-1]
+
+
+def iter_frames(system: dict, max_iterations: int, workers: int = 1, stream: bool = False,
+                cache=None, recorder=None, palette: LinePalette = None, **options):
+    """
+    Render the frames 1..max_iterations of a system as palette images, in order.
+
+    Every frame is quantized to one shared palette, in the worker that rendered
+    it. With more than one worker every worker renders a contiguous range of
+    frames from LSystem.iter_generations, the ranges balanced by the segment
+    estimate of GrowthAnalyzer. With a single worker, or when the whole
+    animation draws fewer than PARALLEL_MIN_SEGMENTS segments, the frames are
+    rendered in this process, from the generation cache when one is given.
+
     Args:
-        frame_files: List of file paths to the frames
+        system: L-system definition
+        max_iterations: Iteration of the last frame
+        workers: Number of worker processes
+        stream: Stream every frame from the axiom instead of holding whole generations
+        cache: Optional GenerationCache used by the single-worker path
+        recorder: Optional instrument.StageRecorder timing every frame's stages
+        palette: Shared palette, by default frame_palette(options)
+        options: Keyword arguments for raster.render_image
+    """
+    recorder = recorder or instrument.StageRecorder("frames")
+    palette = palette or frame_palette(options)
+    lsys = lsystem.LSystem(custom_system=system)
+    if workers > 1:
+        analyzer = analysis.GrowthAnalyzer(lsys)
+        weights = [analyzer.segments(i) + 1 for i in range(1, max_iterations + 1)]
+        if sum(weights) < PARALLEL_MIN_SEGMENTS:
+            workers = 1
+    if workers <= 1:
+        if stream:
+            for i in range(1, max_iterations + 1):
+                with recorder.stage("render", iterations=i, frames=1):
+                    image = raster.render_system(system, i, **options)
+                with recorder.stage("quantize", iterations=i):
+                    frame = palette.frame(image)
+                yield frame
+            return
+        if cache is None:
+            generations = lsys.iter_generations(max_iterations, start=1)
+        for i in range(1, max_iterations + 1):
+            with recorder.stage("generate", iterations=i) as record:
+                if cache is not None:
+                    instructions = cache.generate(system, i, lsys)
+                else:
+                    _, instructions = next(generations)
+                record["symbols"] = len(instructions)
+            with recorder.stage("geometry", iterations=i) as record:
+                segments = geometry.compute_segments(lsys.lSystem, instructions)
+                record["segments"] = len(segments)
+            with recorder.stage("render", iterations=i, frames=1):
+                image = raster.render_image(segments, **options)
+            with recorder.stage("quantize", iterations=i):
+                frame = palette.frame(image)
+            yield frame
+        return
+
+    # Workers are not forked from here: this often runs on a background thread of the
+    # Tk app, and forking a multi-threaded process holding an X connection is unsafe
+    ranges = split_iterations(weights, workers)
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=utils.get_process_context()) as executor:
+        pending = [(first, last, executor.submit(_render_frames, system, first, last, stream, options, palette))
+                   for first, last in ranges]
+        try:
+            while pending:
+                first, last, future = pending[0]
+                # Only the wait is visible here; the work itself runs in the workers
+                with recorder.stage("frame wait", iterations=last, frames=last - first + 1):
+                    frames = future.result()
+                pending.pop(0)
+                yield from frames
+        finally:
+            # Closed early (e.g. a cancelled animation): drop the frames not started yet
+            for _, _, future in pending:
+                future.cancel()
+
+
+def _encode_indices(indices: np.ndarray, palette: LinePalette) -> bytes:
+    """LZW-encode an index array with Pillow, returning the bare image block"""
+    buffer = io.BytesIO()
+    palette.image(np.ascontiguousarray(indices)).save(buffer, format="GIF", optimize=False)
+    size_bits, _, block = split_frame(buffer.getvalue())
+    if size_bits != palette.size_bits:
+        raise ValueError("Pillow changed the size of the shared palette")
+    return block[:9] + bytes([block[9] & ~0x87]) + block[10:]
+
+
+def write_delta_gif(frames, output_gif, duration=500, loop=0, palette: LinePalette = None, recorder=None):
+    """
+    Stream palette frames into an animated GIF with a global palette and delta frames.
+
+    After the first frame, each frame only stores the bounding box of the pixels
+    that changed, and is left in place (disposal 1) for the next one to draw over.
+    Unchanged pixels inside the box are made transparent when that encodes smaller.
+
+    Args:
+        frames: Iterable of palette images from iter_frames (or RGB images, quantized with palette)
         output_gif: Path to save the output GIF
         duration: Duration for each frame in milliseconds
+        loop: Number of loops, 0 means loop forever
+        palette: The frames' shared palette, by default a black on white ramp
+        recorder: Optional instrument.StageRecorder timing every frame's encoding
+
+    Returns:
+        Number of frames written
     """
-    # Ensure animations directory exists
-    os.makedirs(os.path.dirname(output_gif), exist_ok=True)
-    
-    # Open all frames
-    frames = [Image.open(f) for f in frame_files]
-    
-    # Save as animated GIF
-    frames[0].save(
-        output_gif,
-        format="GIF",
-        append_images=frames[1:],
-        save_all=True,
-        duration=duration,
-        loop=0  # 0 means loop forever
-    )
-    
-    print(f"Created animated GIF: {output_gif}")
-    
-    # Clean up frame files
-    for f in frame_files:
-        try:
-            os.remove(f)
-        except:
-            pass
\ No newline at end of file
+    os.makedirs(os.path.dirname(output_gif) or ".", exist_ok=True)
+    palette = palette or LinePalette()
+    recorder = recorder or instrument.StageRecorder("gif")
+    delay = (duration // 10).to_bytes(2, "little")
+
+    count = 0
+    previous = None
+    with open(output_gif, "wb") as file:
+        for frame in frames:
+            with recorder.stage("encode", frames=1) as record:
+                indices = np.asarray(frame) if frame.mode == "P" else palette.quantize(frame)
+                masked = None
+                if previous is None:
+                    height, width = indices.shape
+                    file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF0 | palette.size_bits, 0, 0))
+                    file.write(palette.table)
+                    file.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + loop.to_bytes(2, "little") + b"\x00")
+                    left, top, patch = 0, 0, indices
+                else:
+                    changed = indices != previous
+                    rows = np.flatnonzero(changed.any(axis=1))
+                    columns = np.flatnonzero(changed.any(axis=0))
+                    if len(rows) == 0:
+                        # Nothing changed: one transparent pixel keeps the frame's delay
+                        left, top, patch = 0, 0, np.full((1, 1), palette.transparent, dtype=np.uint8)
+                    else:
+                        top, bottom = rows[0], rows[-1] + 1
+                        left, right = columns[0], columns[-1] + 1
+                        patch = indices[top:bottom, left:right]
+                        masked = np.where(changed[top:bottom, left:right], patch, palette.transparent)
+                previous = indices
+                block = _encode_indices(patch, palette)
+                if masked is not None:
+                    # Masking unchanged pixels usually compresses better, but not when most of the box changed
+                    masked_block = _encode_indices(masked.astype(np.uint8), palette)
+                    if len(masked_block) < len(block):
+                        block = masked_block
+                # Graphic control extension: leave in place, transparent index, delay
+                file.write(b"!\xf9\x04\x05" + delay + bytes([palette.transparent]) + b"\x00")
+                file.write(block[:1] + struct.pack("<HH", left, top) + block[5:])
+                record["bytes"] = len(block)
+            count += 1
+        file.write(b";")
+
+    if count == 0:
+        os.remove(output_gif)
+        raise ValueError("No frames to write")
+    return count
+
+
+def write_animation(frames, output_path, duration=500, loop=0, palette: LinePalette = None,
+                    animation_format=None, recorder=None):
+    """
+    Write palette frames as an animated GIF, APNG or WebP file.
+
+    GIFs are streamed through write_delta_gif. APNG and WebP go through Pillow,
+    which keeps the frames until the file is written and stores each one as the
+    region that changed from the frame before.
+
+    Args:
+        frames: Iterable of palette images from iter_frames
+        output_path: Path to save the output
+        duration: Duration for each frame in milliseconds
+        loop: Number of loops, 0 means loop forever
+        palette: The frames' shared palette
+        animation_format: One of ANIMATION_FORMATS, by default from the file extension
+        recorder: Optional instrument.StageRecorder timing the encoding
+
+    Returns:
+        Number of frames written
+    """
+    animation_format = animation_format or os.path.splitext(output_path)[1].lstrip(".").lower()
+    if animation_format not in ANIMATION_FORMATS:
+        raise ValueError(f"Unsupported animation format: {animation_format}")
+    if animation_format == "gif":
+        return write_delta_gif(frames, output_path, duration, loop, palette, recorder)
+
+    recorder = recorder or instrument.StageRecorder("animation")
+    frames = list(frames)
+    if not frames:
+        raise ValueError("No frames to write")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with recorder.stage("encode", frames=len(frames)) as record:
+        if animation_format == "apng":
+            frames[0].save(output_path, format="PNG", save_all=True, append_images=frames[1:],
+                           duration=duration, loop=loop, optimize=True)
+        else:
+            frames = [frame.convert("RGB") for frame in frames]
+            frames[0].save(output_path, format="WEBP", save_all=True, append_images=frames[1:],
+                           duration=duration, loop=loop, lossless=True)
+        record["bytes"] = os.path.getsize(output_path)
+    return len(frames)
@@ -0,0 +1,207 @@
+"""
+Instanced L-system geometry.
+
+The geometry of a symbol after d rewrites is the geometry of its successor's
+symbols after d - 1 rewrites, each placed by the turtle pose reached so far.
+Memoizing one block per (symbol, depth) therefore describes the whole drawing
+with work and memory proportional to the grammar size times the depth, instead
+of the length of the generated string; segments are only produced when the
+blocks are flattened.
+"""
+import math
+import numpy as np
+from . import geometry
+from . import lsystem
+
+# Blocks with at most this many segments cache their flattened local geometry
+DEFAULT_LEAF_SEGMENTS = 4096
+
+
+class Block:
+    __slots__ = ("key", "instances", "segments", "net", "count", "local")
+
+    def __init__(self, key, instances=(), segments=None, net=(0.0, 0.0, 0.0), count=0):
+        """
+        Geometry of one (symbol, depth) expansion, in its own frame.
+
+        The frame starts at the origin heading 0 degrees. net is the (dx, dy, dheading)
+        the turtle ends up with; instances are (child block, (x, y, heading)) placements
+        and segments the block's own (K, 4) segments (only for forward symbols at depth 0).
+        """
+        self.key = key
+        self.instances = list(instances)
+        self.segments = segments
+        self.net = net
+        self.count = count
+        self.local = segments
+
+
+def compose(pose, offset):
+    """Pose reached by applying offset (in the frame of pose) to pose; both are (x, y, heading)"""
+    x, y, heading = pose
+    dx, dy, dheading = offset
+    c = math.cos(math.radians(heading))
+    s = math.sin(math.radians(heading))
+    return (x + c * dx - s * dy, y + s * dx + c * dy, heading + dheading)
+
+
+def place(segments: np.ndarray, pose) -> np.ndarray:
+    """Map (K, 4) segments from a block frame to the frame given by pose"""
+    x, y, heading = pose
+    c = math.cos(math.radians(heading))
+    s = math.sin(math.radians(heading))
+    xs = segments[:, 0::2]
+    ys = segments[:, 1::2]
+    placed = np.empty_like(segments)
+    placed[:, 0::2] = x + c * xs - s * ys
+    placed[:, 1::2] = y + s * xs + c * ys
+    return placed
+
+
+class InstancedGeometry:
+    def __init__(self, lsys: lsystem.LSystem, iterations: int, leaf_segments: int = DEFAULT_LEAF_SEGMENTS):
+        """
+        Build the block tree of an L-system after the given iterations.
+
+        :param lsys: The L-system.
+        :param iterations: Number of rewrites.
+        :param leaf_segments: Blocks up to this many segments cache their flattened geometry.
+        :raises ValueError: If the system cannot be instanced: a production rewrites a
+                            bracket, or a successor has unbalanced brackets (a pop would
+                            then restore state saved outside its own block).
+        """
+        self.lsys = lsys
+        self.iterations = iterations
+        self.leaf_segments = leaf_segments
+        self.blocks = {}
+
+        system = lsys.lSystem
+        settings = system["settings"]
+        walker = geometry.TurtleWalker(system)
+        self.classes = {char: int(walker.classify(char)[0]) for char in lsys.table}
+        for char in system["axiom"]:
+            self.classes.setdefault(char, int(walker.classify(char)[0]))
+        self.turns = {geometry.TURN_RIGHT: -float(settings["angle"]), geometry.TURN_LEFT: float(settings["angle"]),
+                      geometry.TURN_AROUND: -180.0}
+        self.distance = float(settings["distance"])
+        self.turn_left_stack = float(settings["turnLeftStack"])
+        self.turn_right_stack = float(settings["turnRightStack"])
+
+        for char, successor in lsys.table.items():
+            if self.classes[char] in (geometry.PUSH, geometry.POP):
+                if successor != char:
+                    raise ValueError(f"Cannot instance a system whose rules rewrite the bracket {char!r}")
+                continue
+            depth = 0
+            for symbol in successor:
+                depth += {geometry.PUSH: 1, geometry.POP: -1}.get(self.classes[symbol], 0)
+                if depth < 0:
+                    break
+            if depth != 0:
+                raise ValueError(f"Cannot instance a system with unbalanced brackets in the successor of {char!r}")
+
+        self.start = (float(system["goto"]["x"]), float(system["goto"]["y"]), float(settings["headingAngle"]))
+        self.root = self.__compose(("axiom", iterations), system["axiom"], iterations)
+        self.end_pose = compose(self.start, self.root.net)
+
+    @property
+    def segment_count(self) -> int:
+        """Number of segments the flattened geometry has"""
+        return self.root.count
+
+    def __block(self, char: str, depth: int) -> Block:
+        """Memoized block of a symbol after depth rewrites"""
+        if depth == 0 or self.lsys.table.get(char, char) == char:
+            depth = 0
+        key = (char, depth)
+        block = self.blocks.get(key)
+        if block is not None:
+            return block
+        if depth == 0:
+            symbol_class = self.classes.get(char, geometry.OTHER)
+            if symbol_class == geometry.FORWARD:
+                block = Block(key, segments=np.array([[0.0, 0.0, self.distance, 0.0]]),
+                              net=(self.distance, 0.0, 0.0), count=1)
+            else:
+                block = Block(key, net=(0.0, 0.0, self.turns.get(symbol_class, 0.0)))
+        else:
+            block = self.__compose(key, self.lsys.table[char], depth - 1)
+        self.blocks[key] = block
+        return block
+
+    def __compose(self, key, successor: str, depth: int) -> Block:
+        """Walk a successor (or the axiom) placing the blocks of its symbols at depth"""
+        pose = (0.0, 0.0, 0.0)
+        stack = []
+        instances = []
+        count = 0
+        for char in successor:
+            symbol_class = self.classes.get(char, geometry.OTHER)
+            if symbol_class == geometry.PUSH:
+                stack.append(pose)
+                pose = (pose[0], pose[1], pose[2] + self.turn_left_stack)
+            elif symbol_class == geometry.POP:
+                if stack:  # Unmatched pops (only possible in the axiom) are ignored
+                    x, y, heading = stack.pop()
+                    pose = (x, y, heading - self.turn_right_stack)
+            else:
+                child = self.__block(char, depth)
+                if child.count:
+                    instances.append((child, pose))
+                    count += child.count
+                pose = compose(pose, child.net)
+        return Block(key, instances=instances, net=pose, count=count)
+
+    def __local(self, block: Block) -> np.ndarray:
+        """Flattened segments of a small block in its own frame, cached on the block"""
+        if block.local is None:
+            block.local = np.concatenate([place(self.__local(child), pose) for child, pose in block.instances])
+        return block.local
+
+    def iter_segments(self, chunk_size: int = geometry.DEFAULT_CHUNK_SIZE):
+        """
+        Flatten the blocks into (N, 4) segment arrays, in turtle walk order.
+
+        Blocks of up to leaf_segments segments are flattened once and then only
+        transformed, so the output streams without ever holding the whole drawing.
+
+        :param chunk_size: Approximate number of segments per yielded array.
+        """
+        pending = [(self.root, self.start)]
+        batch = []
+        size = 0
+        while pending:
+            block, pose = pending.pop()
+            if block.count == 0:
+                continue
+            if block.count <= self.leaf_segments or not block.instances:
+                batch.append(place(self.__local(block), pose))
+                size += block.count
+                if size >= chunk_size:
+                    yield np.concatenate(batch)
+                    batch = []
+                    size = 0
+                continue
+            for child, offset in reversed(block.instances):
+                pending.append((child, compose(pose, offset)))
+        if batch:
+            yield np.concatenate(batch)
+
+    def flatten(self) -> np.ndarray:
+        """All segments as one (N, 4) array, equivalent to geometry.compute_segments"""
+        chunks = list(self.iter_segments())
+        return np.concatenate(chunks) if chunks else np.empty((0, 4))
+
+
+def iter_system_segments(lsys: lsystem.LSystem, iterations: int, chunk_size: int = geometry.DEFAULT_CHUNK_SIZE):
+    """
+    Yield the segments of an L-system after some iterations, instanced when possible.
+
+    Systems that cannot be instanced are generated and walked symbol by symbol
+    instead; both paths give the same segments in the same order.
+    """
+    try:
+        instanced = InstancedGeometry(lsys, iterations)
+    except ValueError:
+        return geometry.iter_segment_chunks(lsys.lSystem, lsys.iter_chunks(iterations), chunk_size)
+    return instanced.iter_segments(chunk_size)
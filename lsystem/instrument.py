@@ -0,0 +1,136 @@
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def current_rss_kb():
+    """Resident set size of this process right now in KiB, or None where unsupported (Linux only)"""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class StageRecorder:
+    def __init__(self, run: str, log_path: str = None):
+        """
+        Collect wall time, counts and memory for the stages of one run.
+
+        Every record holds the resident set size after the stage (rss_kb) and,
+        for stages timed with stage(), how much it grew or shrank while the stage
+        ran (rss_delta_kb). process_peak_rss_kb is the peak over the whole process
+        lifetime, so in a long-running app it only changes when a stage sets a
+        new high.
+
+        :param run: Name of the run, e.g. "draw" or "animate".
+        :param log_path: Optional JSON-lines file the records are appended to by flush().
+        """
+        self.run = run
+        self.log_path = log_path
+        self.records = []
+        self.started = datetime.now().isoformat(timespec="seconds")
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        """
+        Time a stage. The yielded dict can be filled with counts while the stage runs:
+
+            with recorder.stage("generate", iterations=6) as record:
+                record["symbols"] = len(lsys.generate(6))
+        """
+        record = {"run": self.run, "started": self.started, "stage": name}
+        record.update(fields)
+        rss_before = current_rss_kb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self.__add_memory(record, rss_before)
+            self.records.append(record)
+
+    def add(self, name: str, seconds: float, **fields) -> dict:
+        """Record a stage timed elsewhere, e.g. one spread over several Tk callbacks"""
+        record = {"run": self.run, "started": self.started, "stage": name}
+        record.update(fields)
+        record["seconds"] = seconds
+        self.__add_memory(record)
+        self.records.append(record)
+        return record
+
+    @staticmethod
+    def __add_memory(record: dict, rss_before=None) -> None:
+        """Fill in the current RSS, its change since rss_before when known, and the process peak"""
+        record["rss_kb"] = current_rss_kb()
+        if rss_before is not None and record["rss_kb"] is not None:
+            record["rss_delta_kb"] = record["rss_kb"] - rss_before
+        record["process_peak_rss_kb"] = peak_rss_kb()
+
+    def totals(self) -> list:
+        """Aggregate the records per stage name, in the order stages first ran"""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["stage"], {"stage": record["stage"], "calls": 0, "seconds": 0.0})
+            total["calls"] += 1
+            total["seconds"] += record["seconds"]
+            for key in ("symbols", "segments", "frames", "bytes", "rss_delta_kb"):
+                if key in record:
+                    total[key] = total.get(key, 0) + record[key]
+        return list(totals.values())
+
+    def summary(self) -> str:
+        """Short human readable per-stage summary"""
+        lines = []
+        for total in self.totals():
+            calls = f" x{total['calls']}" if total["calls"] > 1 else ""
+            counts = "".join(f", {total[key]} {key}" for key in ("symbols", "segments", "frames", "bytes")
+                             if key in total)
+            if "rss_delta_kb" in total:
+                counts += f", RSS {total['rss_delta_kb'] / 1024:+.1f} MB"
+            lines.append(f"{total['stage']}{calls}: {total['seconds'] * 1000:.1f} ms{counts}")
+        peak = peak_rss_kb()
+        if peak is not None:
+            lines.append(f"process peak RSS: {peak / 1024:.1f} MB")
+        return "\n".join(lines)
+
+    def flush(self) -> None:
+        """Append the records to the JSON-lines log, if one was given"""
+        if not self.log_path or not self.records:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with open(self.log_path, "a") as file:
+            for record in self.records:
+                file.write(json.dumps(record) + "\n")
+
+
+def profile_call(function, output_path: str, *args, **kwargs):
+    """
+    Run function under cProfile and dump the stats to output_path.
+
+    The dump can be inspected with `python -m pstats <file>` or snakeviz.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(output_path)
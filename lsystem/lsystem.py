@@ -1,7 +1,7 @@
-import turtle
 import re
 import os
-from . import gif 
+from . import geometry
+from . import progressive
 
 class LSystem:
     def __init__(self, custom_system: dict):
@@ -17,14 +17,28 @@ class LSystem:
         if custom_system:
             self.lSystem.update(custom_system)
 
+        # Explicit productions keyed on single symbols, e.g. {"A": "B-A-B", "B": "A+B+A"};
+        # the legacy r1/r2 rules below only apply when the system defines them
+        rules = self.lSystem["rules"]
+        self.productions = {symbol: successor for symbol, successor in rules.items() if len(symbol) == 1}
+        self.legacy_rules = "r1" in rules or "r2" in rules
+
         # Regex patterns for character transformation
         self.re_1 = re.compile(r'[A-U]|[1-9]')  # draw forward              
         self.re_2 = re.compile(r'[a-u]')  # Move forward without drawing    
         self.re_3 = re.compile(r'[V-Z]|[v-z]')  # Don't do anything         
         self.re_4 = re.compile(r'[+-\|\[\]]')  # Turn left, turn right, save state, restore state              
 
+        # Symbol -> replacement table compiled once from the rules above
+        self.__compile_rules()
+
     def apply_rules(self, char: str) -> str:
         """Apply transformation rules to a single character"""
+        # Explicit productions take precedence; without legacy rules other symbols are constants
+        if char in self.productions:
+            return self.productions[char]
+        if not self.legacy_rules:
+            return char
         # If the character equals var2 (for our tree "0"), then return rule2.
         if char == self.lSystem["variables"]["var2"]:
             return self.lSystem["rules"]["r2"]
@@ -40,19 +54,247 @@ class LSystem:
             return char
         
 
+    def __compile_rules(self) -> None:
+        """
+        Compile apply_rules into a symbol -> replacement table for bulk rewriting.
+
+        A rewrite is one translate pass over the string plus one replace pass per
+        rewritten symbol (see the byte engine below), so the work per symbol grows
+        slowly with the number of rules. The str.translate fallback dispatches
+        through the table in a single pass.
+        """
+        axiom = self.lSystem["axiom"]
+
+        # Every symbol that can ever appear: the axiom plus everything the rules produce
+        alphabet = set(axiom)
+        pending = list(alphabet)
+        while pending:
+            for char in self.apply_rules(pending.pop()):
+                if char not in alphabet:
+                    alphabet.add(char)
+                    pending.append(char)
+        self.table = {char: self.apply_rules(char) for char in alphabet}
+        self.__str_table = {ord(char): replacement for char, replacement in self.table.items()
+                            if replacement != char}
+
+        # Byte engine: one translate() pass swaps every rewritten symbol for an unused
+        # placeholder byte (and drops deleted ones), then one replace() per rule expands them
+        self.__byte_rules = None
+        if any(ord(char) > 255 for char in alphabet):
+            return
+        rewritten = sorted(char for char, replacement in self.table.items() if replacement not in (char, ""))
+        free = [byte for byte in range(256) if chr(byte) not in alphabet]
+        if len(free) < len(rewritten):
+            return
+        placeholders = bytes(free[:len(rewritten)])
+        self.__alphabet = "".join(sorted(alphabet)).encode("latin-1")
+        self.__byte_rules = (
+            bytes.maketrans("".join(rewritten).encode("latin-1"), placeholders),
+            "".join(char for char, replacement in self.table.items() if replacement == "").encode("latin-1"),
+            [(bytes([placeholder]), self.table[char].encode("latin-1"))
+             for placeholder, char in zip(placeholders, rewritten)],
+        )
+
+    def __process_bytes(self, buffer: bytes) -> bytes:
+        """Rewrite a whole generation held in a latin-1 byte buffer"""
+        translation, deleted, replacements = self.__byte_rules
+        buffer = buffer.translate(translation, deleted)
+        for placeholder, replacement in replacements:
+            buffer = buffer.replace(placeholder, replacement)
+        return buffer
+
     def __process_string(self, string: str) -> str:
         """Process a string by applying rules to each character"""
         return "".join(self.apply_rules(char) for char in string)
 
     def generate(self, iterations: int) -> str:
         """Generate the L-system string after the specified number of iterations"""
+        return self.rewrite(self.lSystem["axiom"], iterations)
+
+    def rewrite(self, instructions: str, iterations: int = 1) -> str:
+        """Apply the rules to an already generated string the given number of times"""
+        if self.__byte_rules is None:
+            current_string = instructions
+            for _ in range(iterations):
+                current_string = current_string.translate(self.__str_table)
+            return current_string
+
+        try:
+            buffer = instructions.encode("latin-1")
+        except UnicodeEncodeError:
+            buffer = None
+        if buffer is None or buffer.translate(None, self.__alphabet):
+            # Symbols the rules never produce may collide with the placeholder bytes
+            current_string = instructions
+            for _ in range(iterations):
+                current_string = self.__process_string(current_string)
+            return current_string
+
+        for _ in range(iterations):
+            buffer = self.__process_bytes(buffer)
+        return buffer.decode("latin-1")
+
+    def iter_generations(self, iterations: int, start: int = 0):
+        """
+        Yield (iteration, instructions) for every generation from start up to iterations.
+
+        Each generation is rewritten from the previous one, so producing all of them
+        costs the same as a single generate(iterations).
+        """
+        if self.__byte_rules is None:
+            current_string = self.lSystem["axiom"]
+            for i in range(iterations + 1):
+                if i >= start:
+                    yield i, current_string
+                if i < iterations:
+                    current_string = current_string.translate(self.__str_table)
+            return
+
+        buffer = self.lSystem["axiom"].encode("latin-1")
+        for i in range(iterations + 1):
+            if i >= start:
+                yield i, buffer.decode("latin-1")
+            if i < iterations:
+                buffer = self.__process_bytes(buffer)
+
+    def __expansion(self, char: str, remaining: int, memo: dict, limit: int):
+        """Return the expansion of char after remaining rewrites, or None if it exceeds limit"""
+        replacement = self.table[char]
+        if remaining == 0 or replacement == char:
+            return char
+        key = (char, remaining)
+        if key not in memo:
+            parts = []
+            size = 0
+            for symbol in replacement:
+                part = self.__expansion(symbol, remaining - 1, memo, limit)
+                if part is None:
+                    break
+                size += len(part)
+                if size > limit:
+                    break
+                parts.append(part)
+            else:
+                memo[key] = "".join(parts)
+                return memo[key]
+            memo[key] = None
+        return memo[key]
+
+    def iter_chunks(self, iterations: int, chunk_size: int = 65536):
+        """
+        Lazily yield generate(iterations) as consecutive string chunks.
+
+        Symbols are expanded depth-first, so memory stays bounded by the iteration depth
+        instead of the length of the final string. Expansions shorter than chunk_size are
+        memoized per (symbol, remaining depth) and emitted whole.
+        """
+        memo = {}
+        pending = []
+        size = 0
+        stack = [(iter(self.lSystem["axiom"]), iterations)]
+        while stack:
+            symbols, remaining = stack[-1]
+            for char in symbols:
+                expanded = self.__expansion(char, remaining, memo, chunk_size)
+                if expanded is None:
+                    # Too long to hold at once: descend into its replacement instead
+                    stack.append((iter(self.table[char]), remaining - 1))
+                    break
+                pending.append(expanded)
+                size += len(expanded)
+                if size >= chunk_size:
+                    yield "".join(pending)
+                    pending = []
+                    size = 0
+            else:
+                stack.pop()
+        if pending:
+            yield "".join(pending)
+
+    def iter_symbols(self, iterations: int):
+        """Lazily yield the symbols of generate(iterations) one at a time"""
+        for chunk in self.iter_chunks(iterations):
+            yield from chunk
+
+    def generate_reference(self, iterations: int) -> str:
+        """Generate the L-system string with the per-character regex rules (slow reference path)"""
         current_string = self.lSystem["axiom"]
         for _ in range(iterations):
             current_string = self.__process_string(current_string)
         return current_string
 
-    def draw(self, instructions: str, generate_gif: bool = False) -> turtle.Turtle:
-        """Draw the L-system using turtle graphics"""
+    def draw(self, instructions, generate_gif: bool = False) -> "turtle.Turtle":
+        """
+        Draw the L-system using turtle graphics.
+
+        The walk itself is computed in bulk by geometry.TurtleWalker and drawn with
+        draw_segments. Accepts a string or any iterable of strings (e.g. iter_symbols
+        or iter_chunks).
+        """
+        walker = geometry.TurtleWalker(self.lSystem)
+        chunks = (walker.walk(chunk) for chunk in geometry.iter_text_chunks(instructions))
+        t = self.draw_segments(chunks)
+
+        # Leave the turtle where the symbol-by-symbol walk would have left it
+        if t.position() != tuple(walker.position.tolist()):
+            t.penup()
+            t.goto(*walker.position.tolist())
+            t.pendown()
+        t.setheading(walker.heading)
+        return t
+
+    def create_turtle(self) -> "turtle.Turtle":
+        """A new turtle at the system's start position and heading, with the pen down"""
+        import turtle  # Only drawing needs Tk; generation stays usable headless
+        t = turtle.Turtle()
+        t.setheading(self.lSystem["settings"]["headingAngle"])
+        t.speed(0)
+        t.penup()
+        t.goto(self.lSystem["goto"]["x"], self.lSystem["goto"]["y"])
+        t.pendown()
+        return t
+
+    @staticmethod
+    def canvas_pen(t) -> tuple:
+        """The turtle's pen as a (Tk color string, width) pair for canvas lines"""
+        screen = t.getscreen()
+        color = t.pencolor()
+        if isinstance(color, tuple):
+            color = "#%02x%02x%02x" % tuple(round(c * 255 / screen.colormode()) for c in color)
+        return color, t.pensize()
+
+    def draw_segments(self, segments) -> "turtle.Turtle":
+        """
+        Draw precomputed segments on the turtle canvas.
+
+        Segments are merged into long polylines by geometry.coalesce_polylines, and
+        each polyline becomes a few canvas line items (see progressive.prepare_pieces),
+        instead of one item per forward move. The turtle is left at the end of the
+        last segment.
+
+        :param segments: Array of shape (N, 4) from geometry.compute_segments, or an
+                         iterable of such arrays.
+        """
+        t = self.create_turtle()
+        chunks = [segments] if hasattr(segments, "shape") else [chunk for chunk in segments if len(chunk)]
+        if not chunks:
+            return t
+
+        screen = t.getscreen()
+        canvas = screen.getcanvas()
+        color, width = self.canvas_pen(t)
+        # Turtle coordinates -> canvas coordinates (y points down on the canvas)
+        for piece in progressive.prepare_pieces(chunks, scale=(screen.xscale, -screen.yscale)):
+            canvas.create_line(piece, fill=color, width=width, capstyle="round", joinstyle="round")
+
+        t.penup()
+        t.goto(*chunks[-1][-1, 2:].tolist())
+        t.pendown()
+        return t
+
+    def draw_reference(self, instructions, generate_gif: bool = False) -> "turtle.Turtle":
+        """Draw the L-system with one turtle call per symbol (slow reference path)"""
+        import turtle
         stack = []
         t = turtle.Turtle()
         t.setheading(self.lSystem["settings"]["headingAngle"])
@@ -0,0 +1,90 @@
+import collections
+import numpy as np
+
+DEFAULT_PAGE_SIZE = 4096  # symbols shown per preview page
+DEFAULT_LINE_WIDTH = 100  # symbols per displayed line, so Tk never lays out one huge line
+
+
+def max_bracket_depth(instructions: str) -> int:
+    """
+    Deepest '[' nesting reached, ignoring unmatched ']' the same way the turtle does.
+
+    The clamped running depth is the running sum minus its lowest negative prefix
+    (a Skorokhod reflection), so the whole string is scanned with NumPy.
+    """
+    steps = np.zeros(len(instructions), dtype=np.int32)
+    data = np.frombuffer(instructions.encode("utf-32-le"), dtype=np.uint32)
+    steps[data == ord("[")] = 1
+    steps[data == ord("]")] = -1
+    if not steps.any():
+        return 0
+    totals = np.cumsum(steps)
+    floor = np.minimum(np.minimum.accumulate(totals), 0)
+    return int((totals - floor).max())
+
+
+def symbol_counts(instructions: str) -> dict:
+    """
+    Count every symbol, in code point order.
+
+    Latin-1 strings are counted with one np.bincount over their bytes; anything
+    else falls back to collections.Counter.
+    """
+    try:
+        data = np.frombuffer(instructions.encode("latin-1"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        return dict(sorted(collections.Counter(instructions).items()))
+    counts = np.bincount(data, minlength=256)
+    return {chr(code): int(counts[code]) for code in np.flatnonzero(counts)}
+
+
+class InstructionPreview:
+    def __init__(self, instructions: str, page_size: int = DEFAULT_PAGE_SIZE, line_width: int = DEFAULT_LINE_WIDTH):
+        """
+        Bounded view of a generated string for the instructions area.
+
+        Only one page of page_size symbols is ever handed to Tk; the full string
+        stays here and is written out by export().
+
+        :param instructions: Generated L-system string.
+        :param page_size: Symbols per page.
+        :param line_width: Symbols per line of a formatted page.
+        """
+        self.instructions = instructions
+        self.page_size = page_size
+        self.line_width = line_width
+        self.page_count = max(1, -(-len(instructions) // page_size))
+        self.__stats = None
+
+    def stats(self) -> dict:
+        """Length, per-symbol counts and maximum bracket depth (computed once)"""
+        if self.__stats is None:
+            self.__stats = {
+                "length": len(self.instructions),
+                "counts": symbol_counts(self.instructions),
+                "max_depth": max_bracket_depth(self.instructions),
+            }
+        return self.__stats
+
+    def page(self, index: int) -> str:
+        """Text of a page, clamped to the valid range and wrapped into lines"""
+        index = min(max(index, 0), self.page_count - 1)
+        start = index * self.page_size
+        text = self.instructions[start:start + self.page_size]
+        return "\n".join(text[i:i + self.line_width] for i in range(0, len(text), self.line_width))
+
+    def header(self, index: int) -> str:
+        """Summary stats and the position of the page in the string"""
+        stats = self.stats()
+        counts = ", ".join(f"{char}: {count}" for char, count in stats["counts"].items())
+        start = min(max(index, 0), self.page_count - 1) * self.page_size
+        end = min(start + self.page_size, stats["length"])
+        return (f"Length: {stats['length']} symbols, max bracket depth: {stats['max_depth']}\n"
+                f"Counts: {counts}\n"
+                f"Page {index + 1}/{self.page_count} (symbols {start}-{end})")
+
+    def export(self, path: str, chunk_size: int = 1 << 20) -> None:
+        """Write the full string to a file in chunks"""
+        with open(path, "w", encoding="utf-8") as file:
+            for start in range(0, len(self.instructions), chunk_size):
+                file.write(self.instructions[start:start + chunk_size])
@@ -0,0 +1,115 @@
+"""
+Progressive drawing on a Tk canvas.
+
+Polylines are cut into pieces of bounded size ahead of time (off the main
+thread), then created a few at a time from Tk after() callbacks. Every tick
+stops once its time budget is spent and the next one is scheduled for the
+next frame, so the first lines show up right away, the drawing fills in at
+the target frame rate and input events are handled between ticks.
+"""
+import time
+import numpy as np
+from . import geometry
+
+DEFAULT_FRAME_RATE = 30
+
+# Milliseconds of canvas work per tick; the rest of the frame is left to the event loop
+DEFAULT_BUDGET_MS = 10
+
+# Points per canvas line item, which bounds the cost of a single create_line call
+DEFAULT_PIECE_POINTS = 1024
+
+
+def prepare_pieces(segments, piece_points: int = DEFAULT_PIECE_POINTS, scale=(1.0, -1.0), check=None) -> list:
+    """
+    Merge segments into polylines and cut them into canvas-ready pieces.
+
+    Runs without Tk, so it can be done on a worker thread. Consecutive pieces of a
+    polyline share their end point, so the drawing stays connected.
+
+    :param segments: Array of shape (N, 4) or an iterable of such arrays, in screen units.
+    :param piece_points: Maximum number of points per piece.
+    :param scale: (x, y) factors to canvas coordinates; y is flipped on the turtle canvas.
+    :param check: Optional callable run between polylines, e.g. a task's check_cancelled.
+    :return: List of flat [x0, y0, x1, y1, ...] coordinate lists.
+    """
+    chunks = [segments] if hasattr(segments, "shape") else [chunk for chunk in segments if len(chunk)]
+    if not chunks:
+        return []
+    step = 2 * (max(2, piece_points) - 1)
+    pieces = []
+    for polyline in geometry.coalesce_polylines(np.concatenate(chunks), check):
+        coords = (np.asarray(polyline).reshape(-1, 2) * scale).ravel().tolist()
+        for start in range(0, max(1, len(coords) - 2), step):
+            pieces.append(coords[start:start + step + 2])
+    return pieces
+
+
+class ProgressiveDrawing:
+    def __init__(self, widget, canvas, pieces: list, color="black", width=1,
+                 frame_rate: float = DEFAULT_FRAME_RATE, budget_ms: float = DEFAULT_BUDGET_MS,
+                 on_progress=None, on_done=None):
+        """
+        Create canvas lines for prepared pieces across Tk after() ticks.
+
+        :param widget: Any Tk widget, used for after().
+        :param canvas: Canvas the lines are created on.
+        :param pieces: Flat coordinate lists from prepare_pieces.
+        :param color: Line color, as a Tk color string.
+        :param width: Line width in pixels.
+        :param frame_rate: Ticks per second.
+        :param budget_ms: Time a tick may spend creating lines; at least one piece is
+                          created per tick, so the drawing always makes progress.
+        :param on_progress: Called with (pieces drawn, total pieces) after every tick.
+        :param on_done: Called without arguments once every piece is drawn.
+        """
+        self.widget = widget
+        self.canvas = canvas
+        self.pieces = pieces
+        self.color = color
+        self.width = width
+        self.frame_ms = 1000 / frame_rate
+        self.budget = budget_ms / 1000
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.index = 0
+        self.ticks = 0
+        self.finished = False
+        self.cancelled = False
+        self.after_id = None
+
+    def start(self) -> "ProgressiveDrawing":
+        """Schedule the first tick right away"""
+        self.after_id = self.widget.after(0, self.__tick)
+        return self
+
+    def cancel(self) -> None:
+        """Stop before the next tick; lines already created stay on the canvas"""
+        self.cancelled = True
+        if self.after_id is not None and not self.finished:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    def __tick(self):
+        """Create lines until the budget is spent, then yield to the event loop until the next frame"""
+        self.after_id = None
+        if self.cancelled:
+            return
+        start = time.perf_counter()
+        deadline = start + self.budget
+        while self.index < len(self.pieces):
+            self.canvas.create_line(self.pieces[self.index], fill=self.color, width=self.width,
+                                    capstyle="round", joinstyle="round")
+            self.index += 1
+            if time.perf_counter() >= deadline:
+                break
+        self.ticks += 1
+        if self.on_progress:
+            self.on_progress(self.index, len(self.pieces))
+        if self.index >= len(self.pieces):
+            self.finished = True
+            if self.on_done:
+                self.on_done()
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.after_id = self.widget.after(max(1, round(self.frame_ms - elapsed_ms)), self.__tick)
@@ -0,0 +1,72 @@
+from PIL import Image, ImageDraw
+from . import geometry
+from . import instancing
+from . import lsystem
+from . import viewport
+from .viewport import DEFAULT_WIDTH, DEFAULT_HEIGHT
+
+
+def render_image(segments, width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT,
+                 scale: float = 1.0, supersample: int = 1, line_width: int = 1,
+                 background="white", color="black", fit: bool = False,
+                 tolerance: float = viewport.DEFAULT_TOLERANCE) -> Image.Image:
+    """
+    Rasterize L-system segments straight into a Pillow image.
+
+    Coordinates follow the turtle screen: the origin is the image center and y points up.
+    No display, Tk canvas or Ghostscript is needed. Segments outside the image are
+    culled and sub-pixel detail is merged (see viewport.Viewport.prepare) before drawing.
+
+    :param segments: Array of shape (N, 4) from geometry.compute_segments, or an
+                     iterable of such arrays (e.g. geometry.iter_segment_chunks).
+    :param width: Output width in pixels.
+    :param height: Output height in pixels.
+    :param scale: Pixels per turtle unit.
+    :param supersample: Draw at this many times the resolution and downsample, for anti-aliasing.
+    :param line_width: Line width in output pixels.
+    :param background: Background color.
+    :param color: Line color.
+    :param fit: Scale and center the drawing to fill the image; scale is then ignored.
+    :param tolerance: Level-of-detail grid in drawing pixels, 0 to draw every segment.
+    :return: RGB image of size (width, height).
+    """
+    factor = max(1, int(supersample))
+    image = Image.new("RGB", (width * factor, height * factor), background)
+    draw = ImageDraw.Draw(image)
+    center_x = width * factor / 2
+    center_y = height * factor / 2
+
+    chunks = [segments] if hasattr(segments, "shape") else segments
+    if fit:
+        chunks = list(chunks)
+        view = viewport.Viewport.fit(viewport.segment_bounds(chunks), width, height)
+    else:
+        view = viewport.Viewport(width, height, scale)
+    for chunk in view.scaled(factor).prepare(chunks, tolerance):
+        for pixels in geometry.iter_polylines(chunk):
+            pixels[:, 0] += center_x
+            pixels[:, 1] = center_y - pixels[:, 1]
+            draw.line(pixels.ravel().tolist(), fill=color, width=line_width * factor)
+
+    if factor > 1:
+        image = image.resize((width, height), Image.LANCZOS)
+    return image
+
+
+def render_system(system: dict, iterations: int, cache=None, **options) -> Image.Image:
+    """
+    Generate, walk and rasterize an L-system in one call.
+
+    The segments are flattened from instanced geometry (or streamed from the
+    generated symbols), so memory stays bounded by the chunk size rather than
+    the length of the generated string.
+
+    :param system: L-system definition.
+    :param iterations: Number of iterations.
+    :param cache: Optional cache.GeometryCache the segments of large systems are read through.
+    :param options: Keyword arguments for render_image.
+    """
+    if cache is not None:
+        return render_image(cache.iter_chunks(system, iterations), **options)
+    lsys = lsystem.LSystem(custom_system=system)
+    return render_image(instancing.iter_system_segments(lsys, iterations), **options)
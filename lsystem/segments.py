@@ -0,0 +1,81 @@
+"""
+Compact binary dumps of turtle segments.
+
+Layout (little-endian): the 4 byte magic b"LSEG", a version byte, the item size
+of the coordinates (4 for float32, 8 for float64), two zero bytes, the uint64
+segment count, then [x0, y0, x1, y1] per segment.
+"""
+import struct
+import numpy as np
+from . import geometry
+from . import instancing
+from . import lsystem
+
+MAGIC = b"LSEG"
+VERSION = 1
+HEADER = struct.Struct("<4sBB2xQ")
+DTYPES = {4: np.dtype("<f4"), 8: np.dtype("<f8")}
+
+
+def write_segments(segments, output_path: str, dtype="float32") -> int:
+    """
+    Stream segments into a binary dump, one chunk at a time.
+
+    The count in the header is filled in once every chunk has been written, so
+    segments can be any iterable of (N, 4) arrays and memory stays bounded by
+    the chunk size. The same segments always give the same bytes.
+
+    :param segments: Array of shape (N, 4) or an iterable of such arrays.
+    :param output_path: Path of the dump to write.
+    :param dtype: "float32" or "float64".
+    :return: Number of segments written.
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if dtype.itemsize not in DTYPES or dtype.kind != "f":
+        raise ValueError(f"Unsupported segment dtype: {dtype}")
+    count = 0
+    with open(output_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, dtype.itemsize, 0))
+        chunks = [segments] if hasattr(segments, "shape") else segments
+        for chunk in chunks:
+            file.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+            count += len(chunk)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, dtype.itemsize, count))
+    return count
+
+
+def read_segments(path: str) -> np.ndarray:
+    """
+    Memory-map a dump written by write_segments.
+
+    :return: Read-only array of shape (N, 4).
+    :raises ValueError: If the file is not a segment dump or is truncated.
+    """
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"Not a segment dump: {path}")
+    magic, version, itemsize, count = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or itemsize not in DTYPES:
+        raise ValueError(f"Not a segment dump (or an unsupported version): {path}")
+    if count == 0:
+        return np.empty((0, 4), dtype=DTYPES[itemsize])
+    try:
+        return np.memmap(path, dtype=DTYPES[itemsize], mode="r", offset=HEADER.size, shape=(count, 4))
+    except ValueError:
+        raise ValueError(f"Truncated segment dump: {path}")
+
+
+def dump_system(system: dict, iterations: int, output_path: str, dtype="float32",
+                chunk_size: int = geometry.DEFAULT_CHUNK_SIZE, cache=None) -> int:
+    """
+    Generate and walk an L-system straight into a segment dump, streaming the segments.
+
+    :param cache: Optional cache.GeometryCache the segments of large systems are read
+                  through, when it stores the same dtype.
+    """
+    if cache is not None and cache.dtype == np.dtype(dtype):
+        return write_segments(cache.iter_chunks(system, iterations, chunk_size), output_path, dtype)
+    lsys = lsystem.LSystem(custom_system=system)
+    return write_segments(instancing.iter_system_segments(lsys, iterations, chunk_size), output_path, dtype)
@@ -0,0 +1,410 @@
+"""
+Local render service: a long-running asyncio HTTP server rendering L-systems.
+
+    python serve.py --port 8765
+    python serve.py --unix /tmp/lsystem.sock
+
+POST /render takes a JSON body
+
+    {"system": {...}, "iterations": 6, "format": "png", "options": {"fit": true}}
+
+and answers with the rendered file. Jobs run on a pool of worker processes
+(never importing tkinter or turtle); identical requests in flight at the same
+time share one computation. GET /metrics reports the queue depth and
+latencies, GET /health answers "ok".
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Number
+
+from . import analysis
+from . import cli
+from . import utils
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 256
+MAX_BODY_BYTES = 1024 * 1024
+STREAM_CHUNK_BYTES = 1 << 16
+
+# Latency samples kept for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "gif": "image/gif",
+    "apng": "image/apng",
+    "webp": "image/webp",
+    "seg": "application/octet-stream",
+}
+
+# Options a request may set, with their defaults
+DEFAULT_SETTINGS = {
+    "width": 800,
+    "height": 600,
+    "scale": 1.0,
+    "fit": False,
+    "supersample": 1,
+    "deterministic": True,
+    "instanced": False,
+    "duration": 500,
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        """An HTTP error answered to the client as {"error": message}"""
+        super().__init__(message)
+        self.status = status
+
+
+def parse_render_request(body: dict) -> dict:
+    """
+    Validate a /render body and fill in the defaults.
+
+    :return: {"system", "iterations", "format", "settings"}.
+    :raises RequestError: 400 describing the first problem found.
+    """
+    if not isinstance(body, dict):
+        raise RequestError(400, "body must be a JSON object")
+    if not isinstance(body.get("system"), dict):
+        raise RequestError(400, "system must be an object")
+    iterations = body.get("iterations", 6)
+    if not isinstance(iterations, int) or isinstance(iterations, bool) or iterations < 0:
+        raise RequestError(400, "iterations must be a non-negative integer")
+    fmt = body.get("format", "png")
+    if fmt not in cli.FORMATS:
+        raise RequestError(400, f"format must be one of {', '.join(cli.FORMATS)}")
+    options = body.get("options", {})
+    if not isinstance(options, dict):
+        raise RequestError(400, "options must be an object")
+    settings = dict(DEFAULT_SETTINGS)
+    for key, value in options.items():
+        if key not in DEFAULT_SETTINGS:
+            raise RequestError(400, f"unknown option {key!r}")
+        if isinstance(DEFAULT_SETTINGS[key], bool):
+            if not isinstance(value, bool):
+                raise RequestError(400, f"option {key!r} must be true or false")
+        elif not isinstance(value, Number) or isinstance(value, bool) or value <= 0:
+            raise RequestError(400, f"option {key!r} must be a positive number")
+        settings[key] = value
+    for key in ("width", "height", "supersample", "duration"):
+        settings[key] = int(settings[key])
+    return {"system": body["system"], "iterations": iterations, "format": fmt, "settings": settings}
+
+
+def request_key(request: dict) -> str:
+    """Canonical hash of a parsed render request; equal requests render the same file"""
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def percentiles(samples) -> dict:
+    """p50, p95 and max of some latencies in seconds, or zeros when there are none"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {"p50": ordered[(len(ordered) - 1) // 2], "p95": ordered[int(0.95 * (len(ordered) - 1))],
+            "max": ordered[-1]}
+
+
+class RenderService:
+    def __init__(self, workers: int = None, max_queue: int = DEFAULT_MAX_QUEUE,
+                 max_segments: int = analysis.DEFAULT_MAX_SEGMENTS * 10, cache_dir: str = None):
+        """
+        Job queue, worker pool and request coalescing behind the HTTP handler.
+
+        :param workers: Worker processes rendering jobs, by default one per CPU.
+        :param max_queue: Jobs allowed to wait before requests are answered 503.
+        :param max_segments: Refuse jobs predicted to draw more segments than this
+                             (unless already in the geometry cache).
+        :param cache_dir: Geometry cache folder for png, svg and seg jobs (see
+                          cli.run_job), or None to render without one.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_segments = max_segments
+        self.cache_dir = cache_dir
+        self.queue = None
+        self.executor = None
+        self.dispatchers = []
+        self.output_dir = None
+        self.in_flight = {}  # request key -> {"future", "waiters", "result"}
+        self.running = 0
+        self.started = time.time()
+        self.counters = {"requests": 0, "jobs": 0, "coalesced": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self.queue_wait = deque(maxlen=LATENCY_WINDOW)
+        self.render_time = deque(maxlen=LATENCY_WINDOW)
+        self.request_time = deque(maxlen=LATENCY_WINDOW)
+
+    async def start(self) -> "RenderService":
+        """Start the worker pool and one dispatcher per worker"""
+        self.queue = asyncio.Queue(self.max_queue)
+        # Workers are started on demand; forked from the loop process they would inherit open
+        # client sockets and keep those connections alive after the handler closes them
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=utils.get_process_context())
+        self.output_dir = tempfile.mkdtemp(prefix="lsystem-service-")
+        self.dispatchers = [asyncio.create_task(self.__dispatch()) for _ in range(self.workers)]
+        return self
+
+    async def close(self) -> None:
+        """Stop the dispatchers and the pool and delete the rendered files"""
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    async def __dispatch(self):
+        """Take jobs off the queue and run them on the pool, one at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future, queued = await self.queue.get()
+            self.queue_wait.append(time.perf_counter() - queued)
+            self.running += 1
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(self.executor, cli.run_job, job)
+            except Exception as e:  # The pool itself failed, e.g. a worker died
+                result = dict(job, segments=0, seconds=0.0, error=f"{type(e).__name__}: {e}")
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+            self.render_time.append(time.perf_counter() - start)
+            self.counters["failed" if result["error"] else "completed"] += 1
+            if not future.done():
+                future.set_result(result)
+
+    def acquire(self, request: dict):
+        """
+        Join the computation of an identical request in flight, or queue a new job.
+
+        :return: (key, coalesced); release(key) must be called once the result is used.
+        :raises RequestError: 503 when the queue is full.
+        """
+        key = request_key(request)
+        entry = self.in_flight.get(key)
+        if entry is not None:
+            entry["waiters"] += 1
+            self.counters["coalesced"] += 1
+            return key, True
+
+        settings = request["settings"]
+        job = {"system": request["system"], "path": None, "name": key[:12], "format": request["format"],
+               "iterations": request["iterations"], "max_segments": self.max_segments, "cache": self.cache_dir,
+               "duration": settings["duration"], "options": cli.format_options(request["format"], settings),
+               "output": os.path.join(self.output_dir, f"{key}.{request['format']}")}
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((job, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise RequestError(503, "render queue is full")
+        self.counters["jobs"] += 1
+        self.in_flight[key] = {"future": future, "waiters": 1}
+        return key, False
+
+    async def result(self, key: str) -> dict:
+        """Wait for the job behind an acquired key"""
+        return await asyncio.shield(self.in_flight[key]["future"])
+
+    def release(self, key: str) -> None:
+        """Drop one waiter; the last one deletes the rendered file"""
+        entry = self.in_flight[key]
+        entry["waiters"] -= 1
+        if entry["waiters"] > 0:
+            return
+        del self.in_flight[key]
+
+        def remove_output(future):
+            output = future.result()["output"]
+            if os.path.exists(output):
+                os.remove(output)
+        # Every waiter gone before the job finished (e.g. clients hung up): clean up once it does
+        entry["future"].add_done_callback(remove_output)
+
+    def metrics(self) -> dict:
+        """Queue depth, counters and latency percentiles in seconds"""
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "running": self.running,
+            "in_flight": len(self.in_flight),
+            **self.counters,
+            "queue_wait": percentiles(self.queue_wait),
+            "render": percentiles(self.render_time),
+            "request": percentiles(self.request_time),
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one HTTP/1.1 request per connection"""
+        start = time.perf_counter()
+        try:
+            try:
+                method, path, body = await read_request(reader)
+                if path == "/health":
+                    await send(writer, 200, b"ok\n", "text/plain")
+                elif path == "/metrics":
+                    await send_json(writer, 200, self.metrics())
+                elif path == "/render":
+                    if method != "POST":
+                        raise RequestError(405, "use POST")
+                    await self.__render(writer, body)
+                else:
+                    raise RequestError(404, f"no such endpoint: {path}")
+            except RequestError as e:
+                await send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # The client went away
+        finally:
+            self.request_time.append(time.perf_counter() - start)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def __render(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        """Queue or join a render and stream the file back"""
+        try:
+            request = parse_render_request(json.loads(body or b"null"))
+        except ValueError as e:
+            raise RequestError(400, f"invalid JSON: {e}")
+        self.counters["requests"] += 1
+        key, coalesced = self.acquire(request)
+        try:
+            result = await self.result(key)
+            if result["error"]:
+                raise RequestError(422, result["error"])
+            headers = {"X-Segments": result["segments"], "X-Render-Seconds": f"{result['seconds']:.6f}",
+                       "X-Coalesced": "true" if coalesced else "false"}
+            await send_file(writer, result["output"], CONTENT_TYPES[request["format"]], headers)
+        finally:
+            self.release(key)
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple:
+    """
+    Read one HTTP request.
+
+    :return: (method, path, body bytes).
+    :raises RequestError: 400 or 413 on a malformed or oversized request.
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise RequestError(400, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, "request body too large")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target.split("?", 1)[0], body
+
+
+def response_head(status: int, content_type: str, length: int, headers: dict = None) -> bytes:
+    """Status line and headers of a response with a known length"""
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 422: "Unprocessable Entity", 503: "Service Unavailable"}
+    lines = [f"HTTP/1.1 {status} {reasons.get(status, '')}", f"Content-Type: {content_type}",
+             f"Content-Length: {length}", "Connection: close"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str) -> None:
+    """Answer with a small in-memory body"""
+    writer.write(response_head(status, content_type, len(body)) + body)
+    await writer.drain()
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload) -> None:
+    """Answer with a JSON document"""
+    await send(writer, status, (json.dumps(payload, indent=2) + "\n").encode("utf-8"), "application/json")
+
+
+async def send_file(writer: asyncio.StreamWriter, path: str, content_type: str, headers: dict) -> None:
+    """Stream a file in chunks, waiting for the client to keep up so memory stays bounded"""
+    writer.write(response_head(200, content_type, os.path.getsize(path), headers))
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def serve(service: RenderService, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                unix_path: str = None, ready=None) -> None:
+    """
+    Run the service until cancelled.
+
+    :param ready: Optional callback given the listening address (host, port) or the socket path.
+    """
+    await service.start()
+    try:
+        if unix_path:
+            server = await asyncio.start_unix_server(service.handle, path=unix_path)
+            address = unix_path
+        else:
+            server = await asyncio.start_server(service.handle, host, port)
+            address = server.sockets[0].getsockname()[:2]
+        if ready:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+        if unix_path and os.path.exists(unix_path):
+            os.remove(unix_path)
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="serve.py", description="Serve L-system renders over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port, 0 for any free port")
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="Jobs allowed to wait")
+    parser.add_argument("--max-segments", type=int, default=analysis.DEFAULT_MAX_SEGMENTS * 10,
+                        help="Refuse jobs predicted to draw more segments than this (unless already cached)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Neither read nor store PNG, SVG and seg geometry in the geometry cache")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Run the service until interrupted; returns the exit code"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    service = RenderService(args.jobs, args.max_queue, args.max_segments,
+                            None if args.no_cache else utils.get_cache_dir())
+
+    def ready(address):
+        where = address if isinstance(address, str) else f"http://{address[0]}:{address[1]}"
+        print(f"Serving L-system renders on {where} with {service.workers} worker(s)", flush=True)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
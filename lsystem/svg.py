@@ -0,0 +1,214 @@
+from datetime import datetime
+import numpy as np
+from . import geometry
+from . import instancing
+from . import lsystem
+from . import viewport
+from .viewport import DEFAULT_WIDTH, DEFAULT_HEIGHT
+
+# Points per <path> element; long drawings are split so viewers never parse one huge attribute
+DEFAULT_PATH_POINTS = 10000
+
+# Decimal places kept for coordinates
+DEFAULT_PRECISION = 2
+
+# write_svg options shaping the flat <path> output, which instanced output has no use for
+PATH_OPTIONS = ("tolerance", "precision", "path_points")
+
+
+class _PathWriter:
+    def __init__(self, file, path_points: int):
+        """
+        Stream polylines into <path> elements of at most path_points points.
+
+        Where an element is split, the next one starts with a move to the last
+        point, so the output depends only on the points and never on how they
+        were chunked.
+        """
+        self.file = file
+        self.path_points = max(2, path_points)
+        self.points = 0  # Points in the open element, 0 when none is open
+        self.last = None
+
+    def __move(self, x: int, y: int) -> None:
+        if self.points == 0 or self.points >= self.path_points:
+            self.close()
+            self.file.write(f'<path d="M{x} {y}')
+        else:
+            self.file.write(f" M{x} {y}")
+        self.points += 1
+        self.last = (x, y)
+
+    def polyline(self, flat: list) -> None:
+        """Write a polyline given as flat [x0, y0, x1, y1, ...] integers"""
+        if (flat[0], flat[1]) != self.last:
+            self.__move(flat[0], flat[1])
+        position = 2
+        while position < len(flat):
+            if self.points >= self.path_points:
+                self.__move(*self.last)
+            end = position + 2 * (self.path_points - self.points)
+            piece = flat[position:end]
+            self.file.write(" " + " ".join(map(str, piece)))
+            self.points += len(piece) // 2
+            self.last = (piece[-2], piece[-1])
+            position = end
+
+    def close(self) -> None:
+        if self.points:
+            self.file.write('"/>\n')
+            self.points = 0
+
+
+def write_svg(segments, output_svg: str, width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT,
+              scale: float = 1.0, line_width: float = 1.0, background="white", color="black",
+              bounds=None, tolerance: float = 0.0, precision: int = DEFAULT_PRECISION,
+              path_points: int = DEFAULT_PATH_POINTS, deterministic: bool = False, comment: str = None) -> int:
+    """
+    Stream L-system segments into an SVG file, chunk by chunk.
+
+    Coordinates follow the turtle screen like raster.render_image: the origin is the
+    center of the drawing and y points up. Only one chunk of segments is held at a
+    time, so memory does not grow with the size of the drawing. Coordinates are
+    written as integers in 10^-precision pixel units under a scale transform.
+
+    :param segments: Array of shape (N, 4) or an iterable of such arrays.
+    :param output_svg: Path of the SVG file to write.
+    :param bounds: Optional (min_x, min_y, max_x, max_y) to fit to the image; scale is then ignored.
+    :param tolerance: Level-of-detail grid in pixels, 0 to keep every segment.
+    :param precision: Decimal places kept for pixel coordinates.
+    :param path_points: Maximum number of points per <path> element.
+    :param deterministic: Leave out the creation time, so the same input always gives the same bytes.
+    :param comment: Optional text for a leading comment, e.g. the system and iterations.
+    :return: Number of segments written.
+    """
+    if bounds is not None:
+        view = viewport.Viewport.fit(bounds, width, height)
+    else:
+        view = viewport.Viewport(width, height, scale)
+    factor = 10 ** precision
+    offset = np.array([width / 2, height / 2, width / 2, height / 2])
+    flip = np.array([1, -1, 1, -1])
+
+    count = 0
+    with open(output_svg, "w", newline="\n") as file:
+        file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                   f'viewBox="0 0 {width} {height}">\n')
+        if comment:
+            file.write(f"<!-- {comment} -->\n")
+        if not deterministic:
+            file.write(f"<!-- created {datetime.now().isoformat(timespec='seconds')} -->\n")
+        file.write(f'<rect width="100%" height="100%" fill="{background}"/>\n')
+        file.write(f'<g fill="none" stroke="{color}" stroke-width="{line_width * factor:g}" '
+                   f'stroke-linecap="round" stroke-linejoin="round" transform="scale({1 / factor:g})">\n')
+
+        writer = _PathWriter(file, path_points)
+        for chunk in view.prepare(segments, tolerance):
+            count += len(chunk)
+            pixels = np.round((chunk * flip + offset) * factor).astype(np.int64)
+            for points in geometry.iter_polylines(pixels):
+                writer.polyline(points.ravel().tolist())
+        writer.close()
+        file.write("</g>\n</svg>\n")
+    return count
+
+
+def write_instanced_svg(instanced: instancing.InstancedGeometry, output_svg: str, width: int = DEFAULT_WIDTH,
+                        height: int = DEFAULT_HEIGHT, scale: float = 1.0, line_width: float = 1.0,
+                        background="white", color="black", bounds=None, deterministic: bool = False,
+                        comment: str = None) -> int:
+    """
+    Write instanced geometry as SVG: one group per block, placed by <use> elements.
+
+    The file grows with the number of blocks (grammar size times depth) rather
+    than the number of segments, and viewers expand it when rendering.
+
+    :param instanced: Block tree from instancing.InstancedGeometry.
+    :param bounds: Optional (min_x, min_y, max_x, max_y) to fit to the image; scale is then ignored.
+    :return: Number of blocks written.
+    """
+    if bounds is not None:
+        view = viewport.Viewport.fit(bounds, width, height)
+    else:
+        view = viewport.Viewport(width, height, scale)
+    ids = {}
+
+    def use(block, pose):
+        x, y, heading = pose
+        return f'<use href="#{ids[id(block)]}" transform="translate({x:.10g} {y:.10g}) rotate({heading:.10g})"/>'
+
+    with open(output_svg, "w", newline="\n") as file:
+        file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                   f'viewBox="0 0 {width} {height}">\n')
+        if comment:
+            file.write(f"<!-- {comment} -->\n")
+        if not deterministic:
+            file.write(f"<!-- created {datetime.now().isoformat(timespec='seconds')} -->\n")
+        file.write(f'<rect width="100%" height="100%" fill="{background}"/>\n<defs>\n')
+
+        # Children before parents, so every reference points backwards
+        pending = [(instanced.root, False)] if instanced.segment_count else []
+        while pending:
+            block, expanded = pending.pop()
+            if id(block) in ids:
+                continue
+            if not expanded:
+                pending.append((block, True))
+                pending.extend((child, False) for child, _ in reversed(block.instances) if id(child) not in ids)
+                continue
+            ids[id(block)] = f"b{len(ids)}"
+            file.write(f'<g id="{ids[id(block)]}">')
+            if block.segments is not None:
+                file.write("".join(f'<path d="M{x0:g} {y0:g}L{x1:g} {y1:g}"/>'
+                                   for x0, y0, x1, y1 in block.segments.tolist()))
+            file.write("".join(use(child, pose) for child, pose in block.instances))
+            file.write("</g>\n")
+
+        file.write(f'</defs>\n<g fill="none" stroke="{color}" stroke-width="{line_width / view.scale:g}" '
+                   f'stroke-linecap="round" stroke-linejoin="round" '
+                   f'transform="translate({width / 2:g} {height / 2:g}) scale({view.scale:.10g} {-view.scale:.10g}) '
+                   f'translate({-view.center_x:.10g} {-view.center_y:.10g})">\n')
+        if instanced.segment_count:
+            file.write(use(instanced.root, instanced.start) + "\n")
+        file.write("</g>\n</svg>\n")
+    return len(ids)
+
+
+def render_system_svg(system: dict, iterations: int, output_svg: str, fit: bool = False,
+                      chunk_size: int = geometry.DEFAULT_CHUNK_SIZE, instanced: bool = False, cache=None,
+                      **options) -> int:
+    """
+    Generate, walk and write an L-system to SVG, streaming the segments.
+
+    With fit the segments are streamed twice, once for the bounds and once for the
+    output, so memory stays constant at the cost of walking the system twice.
+
+    :param instanced: Write the block tree with write_instanced_svg instead of every
+                      segment, when the system can be instanced. The path options
+                      (tolerance, precision, path_points) then do not apply and are ignored.
+    :param cache: Optional cache.GeometryCache the segments of large systems are read through
+                  (instanced output does not need them).
+    :param options: Keyword arguments for write_svg.
+    """
+    lsys = lsystem.LSystem(custom_system=system)
+    if instanced:
+        try:
+            blocks = instancing.InstancedGeometry(lsys, iterations)
+        except ValueError:
+            blocks = None
+        if blocks is not None:
+            if fit:
+                options["bounds"] = viewport.segment_bounds(blocks.iter_segments(chunk_size))
+            options.setdefault("comment", f"{iterations} iterations, instanced")
+            instanced_options = {key: value for key, value in options.items() if key not in PATH_OPTIONS}
+            write_instanced_svg(blocks, output_svg, **instanced_options)
+            return blocks.segment_count
+    def chunks():
+        if cache is not None:
+            return cache.iter_chunks(system, iterations, chunk_size)
+        return instancing.iter_system_segments(lsys, iterations, chunk_size)
+
+    if fit:
+        options["bounds"] = viewport.segment_bounds(chunks())
+    options.setdefault("comment", f"{iterations} iterations")
+    return write_svg(chunks(), output_svg, **options)
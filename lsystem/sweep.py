@@ -0,0 +1,269 @@
+"""
+Parameter sweeps rendered into a labeled contact sheet, without a display:
+
+    python sweep.py data/examples/fractal_plant.json angle=15:35:5 iterations=4:6 --output sheet.png
+
+Each parameter takes an inclusive range "start:stop:step" or a list "a,b,c";
+the sheet has one thumbnail per combination.
+"""
+import argparse
+import copy
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from PIL import Image, ImageDraw
+from . import analysis
+from . import cache
+from . import catalog
+from . import geometry
+from . import lsystem
+from . import raster
+from . import utils
+
+# Parameters a sweep can vary: the iteration count and every numeric setting
+PARAMETERS = ("iterations",) + catalog.SETTINGS_KEYS
+
+DEFAULT_THUMBNAIL = 200
+LABEL_HEIGHT = 16
+
+
+def parse_values(text: str) -> list:
+    """
+    Parse "start:stop:step" (inclusive) or "a,b,c" into a list of numbers.
+
+    :raises ValueError: On a malformed spec or a non-positive step.
+    """
+    def number(value):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+
+    if ":" in text:
+        parts = [number(part) for part in text.split(":")]
+        if len(parts) == 2:
+            parts.append(1)
+        if len(parts) != 3 or parts[2] <= 0:
+            raise ValueError(f"Invalid range: {text}")
+        start, stop, step = parts
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        if count <= 0:
+            raise ValueError(f"Empty range: {text}")
+        return [number(round(start + i * step, 10)) for i in range(count)]
+    return [number(part) for part in text.split(",")]
+
+
+def parse_parameters(specs: list) -> dict:
+    """
+    Parse "name=values" specs into {name: [values]}, in the order given.
+
+    :raises ValueError: On an unknown parameter or a malformed value spec.
+    """
+    parameters = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter {name!r}; expected one of {', '.join(PARAMETERS)}")
+        parameters[name] = parse_values(values)
+    if "iterations" in parameters and any(value < 0 or value != int(value) for value in parameters["iterations"]):
+        raise ValueError("iterations must be non-negative integers")
+    return parameters
+
+
+def build_variants(parameters: dict, iterations: int) -> list:
+    """
+    Every combination of the parameter values, in row-major order.
+
+    :param iterations: Iteration count used when iterations is not swept.
+    :return: List of {"iterations": n, "settings": {...}, "label": str}.
+    """
+    names = list(parameters)
+    variants = []
+    for values in itertools.product(*(parameters[name] for name in names)):
+        chosen = dict(zip(names, values))
+        variants.append({
+            "iterations": int(chosen.pop("iterations", iterations)),
+            "settings": chosen,
+            "label": " ".join(f"{name}={value}" for name, value in zip(names, values)),
+        })
+    return variants
+
+
+def render_batch(system: dict, batch: list, options: dict) -> list:
+    """
+    Worker entry point: render a batch of variants of one system into thumbnails.
+
+    The rewrite output does not depend on the drawing settings, so the variants
+    share one generation cache and each iteration count in the batch is expanded
+    only once.
+
+    :return: List of (variant index, image).
+    """
+    # Sections the file leaves out take the LSystem defaults before settings are swept
+    normalized = lsystem.LSystem(custom_system=system).lSystem
+    generations = cache.GenerationCache()
+    results = []
+    for index, variant in sorted(batch, key=lambda item: item[1]["iterations"]):
+        instructions = generations.generate(system, variant["iterations"])
+        variant_system = copy.deepcopy(normalized)
+        variant_system["settings"].update(variant["settings"])
+        segments = geometry.iter_segment_chunks(variant_system, instructions)
+        results.append((index, raster.render_image(segments, fit=True, **options)))
+    return results
+
+
+def check_budget(system: dict, variants: list, max_segments: int) -> None:
+    """
+    Refuse a sweep whose largest variant is predicted to draw more than max_segments.
+
+    Only the iteration count changes the number of segments, so one prediction
+    per distinct count covers every variant.
+
+    :raises ValueError: Naming the iteration counts over the budget.
+    """
+    analyzer = analysis.GrowthAnalyzer(lsystem.LSystem(custom_system=system))
+    over = [(iterations, analyzer.segments(iterations))
+            for iterations in sorted({variant["iterations"] for variant in variants})
+            if analyzer.segments(iterations) > max_segments]
+    if over:
+        counts = ", ".join(f"iterations={iterations} ({segments} segments)" for iterations, segments in over)
+        raise ValueError(f"{counts} over the budget of {max_segments} segments")
+
+
+def split_batches(system: dict, variants: list, workers: int = 1) -> list:
+    """
+    Batch variants by iteration count, splitting the counts into about workers batches.
+
+    Each count gets a share of the batches in proportion to the segments its
+    variants are predicted to draw, so a sweep of one count is still spread
+    over every worker; each batch expands its count once.
+
+    :return: List of batches, each a list of (variant index, variant).
+    """
+    groups = {}
+    for index, variant in enumerate(variants):
+        groups.setdefault(variant["iterations"], []).append((index, variant))
+    if workers <= 1:
+        return list(groups.values())
+    analyzer = analysis.GrowthAnalyzer(lsystem.LSystem(custom_system=system))
+    costs = {iterations: (analyzer.segments(iterations) + 1) * len(group) for iterations, group in groups.items()}
+    total = sum(costs.values())
+    batches = []
+    for iterations, group in groups.items():
+        parts = min(len(group), max(1, round(workers * costs[iterations] / total)))
+        batches.extend(group[len(group) * part // parts:len(group) * (part + 1) // parts] for part in range(parts))
+    return batches
+
+
+def pool_size(batches: list, workers: int) -> int:
+    """Number of worker processes render_sweep uses for the batches (1 when it runs serially)"""
+    if workers <= 1 or len(batches) == 1:
+        return 1
+    return min(workers, len(batches))
+
+
+def render_sweep(system: dict, variants: list, workers: int = 1, thumbnail: int = DEFAULT_THUMBNAIL,
+                 supersample: int = 2, max_segments: int = analysis.DEFAULT_MAX_SEGMENTS) -> list:
+    """
+    Render every variant to a thumbnail, across a process pool when workers > 1.
+
+    Variants are batched by iteration count (see split_batches), so each batch
+    expands its count once however many drawing settings are swept with it; the
+    batches are spread over the workers.
+
+    :raises ValueError: On an invalid system or a variant over max_segments.
+    :return: Thumbnails in the order of variants.
+    """
+    catalog.validate_system(system)
+    check_budget(system, variants, max_segments)
+    options = {"width": thumbnail, "height": thumbnail, "supersample": supersample}
+    batches = split_batches(system, variants, workers)
+    images = [None] * len(variants)
+    processes = pool_size(batches, workers)
+    if processes == 1:
+        results = [render_batch(system, batch, options) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(render_batch, itertools.repeat(system), batches, itertools.repeat(options)))
+    for batch in results:
+        for index, image in batch:
+            images[index] = image
+    return images
+
+
+def contact_sheet(images: list, labels: list, columns: int = None, background="white", color="black") -> Image.Image:
+    """
+    Tile thumbnails into one image, each labeled underneath.
+
+    :param columns: Thumbnails per row, by default roughly a square grid.
+    """
+    if not images:
+        raise ValueError("No thumbnails to tile")
+    columns = columns or math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    width, height = images[0].size
+    sheet = Image.new("RGB", (columns * width, rows * (height + LABEL_HEIGHT)), background)
+    draw = ImageDraw.Draw(sheet)
+    for i, (image, label) in enumerate(zip(images, labels)):
+        x = (i % columns) * width
+        y = (i // columns) * (height + LABEL_HEIGHT)
+        sheet.paste(image, (x, y))
+        draw.rectangle((x, y, x + width - 1, y + height - 1), outline="lightgray")
+        draw.text((x + 4, y + height + 2), label, fill=color)
+    return sheet
+
+
+def sweep_system(system: dict, parameters: dict, iterations: int = 6, workers: int = 1,
+                 thumbnail: int = DEFAULT_THUMBNAIL, columns: int = None,
+                 max_segments: int = analysis.DEFAULT_MAX_SEGMENTS) -> Image.Image:
+    """Render a parameter sweep of a system into a contact sheet"""
+    variants = build_variants(parameters, iterations)
+    images = render_sweep(system, variants, workers, thumbnail, max_segments=max_segments)
+    return contact_sheet(images, [variant["label"] for variant in variants], columns)
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="sweep.py", description="Render a parameter sweep as a contact sheet.")
+    parser.add_argument("system", help="System JSON file")
+    parser.add_argument("parameters", nargs="+",
+                        help=f'Swept values, e.g. "angle=15:35:5" or "iterations=3,5"; one of {", ".join(PARAMETERS)}')
+    parser.add_argument("-i", "--iterations", type=int, default=6, help="Iterations when they are not swept")
+    parser.add_argument("-o", "--output", default=None, help="Output PNG (default: in the animations folder)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--thumbnail", type=int, default=DEFAULT_THUMBNAIL, help="Thumbnail size in pixels")
+    parser.add_argument("--columns", type=int, default=None, help="Thumbnails per row")
+    parser.add_argument("--max-segments", type=int, default=analysis.DEFAULT_MAX_SEGMENTS,
+                        help="Refuse sweeps with a variant predicted to draw more segments than this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Render the sweep and save the contact sheet; returns the exit code"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        with open(args.system, "r") as file:
+            system = json.load(file)
+        parameters = parse_parameters(args.parameters)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    name = os.path.splitext(os.path.basename(args.system))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output = args.output or os.path.join(utils.get_animations_dir(), f"{name}_sweep_{timestamp}.png")
+    start = time.perf_counter()
+    try:
+        sheet = sweep_system(system, parameters, args.iterations, args.jobs, args.thumbnail, args.columns,
+                             args.max_segments)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    sheet.save(output)
+    elapsed = time.perf_counter() - start
+    variants = build_variants(parameters, args.iterations)
+    processes = pool_size(split_batches(system, variants, args.jobs), args.jobs)
+    print(f"{len(variants)} variants rendered in {elapsed:.3f}s with {processes} worker(s): {output}")
+    return 0
@@ -24,6 +24,19 @@ def get_animations_dir():
     
     return animations_dir
 
+def get_cache_dir():
+    """
+    Get the path to the cache directory, next to the animations directory.
+    """
+    
+    project_root = get_project_root()
+    cache_dir = os.path.join(project_root, "cache")
+    
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    
+    return cache_dir
+
 def get_custom_dir():
     """
     Get the path to the custom directory.
@@ -56,3 +69,17 @@ def get_base_abs_path():
     """
     
     return os.path.dirname(os.path.abspath(__file__))
+
+def get_process_context():
+    """
+    Get the multiprocessing context used by the worker pools.
+    
+    Workers are never forked from the calling process, which may hold threads, an
+    X connection or open client sockets: they come from a clean forkserver process
+    where the platform has one, and are spawned fresh elsewhere (e.g. on Windows).
+    """
+    
+    import multiprocessing  # only needed once a pool is started, not at startup
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
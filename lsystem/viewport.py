@@ -0,0 +1,132 @@
+import numpy as np
+
+# Same size as the turtle screen set up in main.py and the control panel
+DEFAULT_WIDTH = 800
+DEFAULT_HEIGHT = 600
+
+# Fraction of the window left empty around a fitted drawing
+DEFAULT_MARGIN = 0.05
+
+# Grid, in output pixels, that segment endpoints are snapped to before drawing;
+# segments shorter than a grid cell collapse and are dropped
+DEFAULT_TOLERANCE = 1.0
+
+
+def segment_bounds(segments):
+    """
+    Bounding box of segments, as (min_x, min_y, max_x, max_y).
+
+    :param segments: Array of shape (N, 4), or an iterable of such arrays.
+    :return: The bounds, or None if there are no segments.
+    """
+    chunks = [segments] if hasattr(segments, "shape") else segments
+    bounds = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        xs = chunk[:, 0::2]
+        ys = chunk[:, 1::2]
+        chunk_bounds = (xs.min(), ys.min(), xs.max(), ys.max())
+        if bounds is None:
+            bounds = chunk_bounds
+        else:
+            bounds = (min(bounds[0], chunk_bounds[0]), min(bounds[1], chunk_bounds[1]),
+                      max(bounds[2], chunk_bounds[2]), max(bounds[3], chunk_bounds[3]))
+    return None if bounds is None else tuple(float(value) for value in bounds)
+
+
+def cull(segments: np.ndarray, bounds) -> np.ndarray:
+    """Keep the segments whose bounding box overlaps bounds (min_x, min_y, max_x, max_y)"""
+    min_x, min_y, max_x, max_y = bounds
+    x0, y0, x1, y1 = segments.T
+    visible = ((np.maximum(x0, x1) >= min_x) & (np.minimum(x0, x1) <= max_x) &
+               (np.maximum(y0, y1) >= min_y) & (np.minimum(y0, y1) <= max_y))
+    return segments if visible.all() else segments[visible]
+
+
+def simplify(segments: np.ndarray, tolerance: float = DEFAULT_TOLERANCE) -> np.ndarray:
+    """
+    Snap endpoints to a grid of tolerance units and drop the segments that collapse.
+
+    A run of sub-pixel segments becomes the few segments that cross grid cells.
+    Connected segments stay connected, because a shared endpoint snaps to the same
+    grid point, so geometry.iter_polylines still joins them. Segments that snap onto
+    one already kept (in either direction) would draw the same pixels again and are
+    dropped too; the first occurrence keeps its place in the walk order.
+    """
+    if tolerance <= 0 or len(segments) == 0:
+        return segments
+    snapped = np.round(segments / tolerance) * tolerance
+    keep = (snapped[:, 0] != snapped[:, 2]) | (snapped[:, 1] != snapped[:, 3])
+    snapped = snapped[keep]
+    swap = (snapped[:, 0] > snapped[:, 2]) | ((snapped[:, 0] == snapped[:, 2]) & (snapped[:, 1] > snapped[:, 3]))
+    # Compared as raw bytes, one row per item; adding 0.0 turns -0.0 into 0.0 first
+    canonical = np.ascontiguousarray(np.where(swap[:, None], snapped[:, [2, 3, 0, 1]], snapped) + 0.0)
+    _, first = np.unique(canonical.view(np.dtype((np.void, canonical.itemsize * 4))).ravel(), return_index=True)
+    if len(first) == len(snapped):
+        return snapped
+    return snapped[np.sort(first)]
+
+
+class Viewport:
+    def __init__(self, width: int, height: int, scale: float = 1.0, center_x: float = 0.0, center_y: float = 0.0):
+        """
+        Window onto turtle coordinates.
+
+        Maps the point (center_x, center_y) to the middle of a width x height window,
+        at scale output pixels per turtle unit. The output keeps the turtle screen's
+        convention: the origin is the middle of the window and y points up.
+        """
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.center_x = center_x
+        self.center_y = center_y
+
+    @classmethod
+    def fit(cls, bounds, width: int, height: int, margin: float = DEFAULT_MARGIN) -> "Viewport":
+        """Viewport that centers bounds in the window and scales them to fill it, less the margin"""
+        if bounds is None:
+            return cls(width, height)
+        min_x, min_y, max_x, max_y = bounds
+        usable = 1 - 2 * margin
+        scales = []
+        if max_x > min_x:
+            scales.append(width * usable / (max_x - min_x))
+        if max_y > min_y:
+            scales.append(height * usable / (max_y - min_y))
+        scale = min(scales) if scales else 1.0
+        return cls(width, height, scale, (min_x + max_x) / 2, (min_y + max_y) / 2)
+
+    def scaled(self, factor: float) -> "Viewport":
+        """The same view on a window factor times larger (e.g. for supersampling)"""
+        return Viewport(self.width * factor, self.height * factor, self.scale * factor, self.center_x, self.center_y)
+
+    def visible_bounds(self):
+        """Turtle coordinate bounds (min_x, min_y, max_x, max_y) covered by the window"""
+        half_width = self.width / 2 / self.scale
+        half_height = self.height / 2 / self.scale
+        return (self.center_x - half_width, self.center_y - half_height,
+                self.center_x + half_width, self.center_y + half_height)
+
+    def transform(self, segments: np.ndarray) -> np.ndarray:
+        """Map turtle coordinates to window pixels, origin in the middle and y up"""
+        center = np.array([self.center_x, self.center_y, self.center_x, self.center_y])
+        return (segments - center) * self.scale
+
+    def prepare(self, segments, tolerance: float = DEFAULT_TOLERANCE):
+        """
+        Cull, transform and simplify segments for drawing in this window.
+
+        :param segments: Array of shape (N, 4) or an iterable of such arrays.
+        :param tolerance: Level-of-detail grid in pixels, 0 to keep every segment.
+        :return: Iterator of (K, 4) arrays in window pixels.
+        """
+        chunks = [segments] if hasattr(segments, "shape") else segments
+        visible = self.visible_bounds()
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            chunk = simplify(self.transform(cull(chunk, visible)), tolerance)
+            if len(chunk):
+                yield chunk
@@ -0,0 +1,115 @@
+import queue
+import threading
+from . import instrument
+
+
+class TaskCancelled(Exception):
+    """Raised inside a background task once cancel() has been requested"""
+
+
+class BackgroundTask:
+    def __init__(self, root, work, on_done, on_error=None, on_cancel=None, on_progress=None, poll_ms=50,
+                 profile_path=None):
+        """
+        Run work on a worker thread and hand its results back to the Tk main loop.
+
+        The worker never touches Tk: it posts messages to a queue that the main loop
+        drains every poll_ms milliseconds with root.after(), and every callback runs
+        on the main thread.
+
+        :param root: Any Tk widget, used for after().
+        :param work: Callable taking this task and returning the result; it should call
+                     report() for progress and check_cancelled() regularly.
+        :param on_done: Called with the result of work.
+        :param on_error: Called with the exception if work raised.
+        :param on_cancel: Called without arguments if the task was cancelled.
+        :param on_progress: Called with (fraction or None, message) for progress reports.
+        :param poll_ms: Queue polling interval in milliseconds.
+        :param profile_path: If given, work runs under cProfile on the worker thread and
+                             the stats are dumped there.
+        """
+        self.root = root
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.on_progress = on_progress
+        self.poll_ms = poll_ms
+        self.profile_path = profile_path
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start(self) -> "BackgroundTask":
+        """Start the worker thread and the polling loop"""
+        self.thread.start()
+        self.root.after(self.poll_ms, self.__poll)
+        return self
+
+    def cancel(self) -> None:
+        """Ask the worker to stop at its next check_cancelled()"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        """Called by the worker: raise TaskCancelled if cancel() was requested"""
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report(self, fraction=None, message="") -> None:
+        """Called by the worker: post progress (fraction in [0, 1] or None) and check for cancellation"""
+        self.messages.put(("progress", (fraction, message)))
+        self.check_cancelled()
+
+    def __run(self):
+        """Worker thread body"""
+        try:
+            if self.profile_path:
+                # cProfile only sees the thread it runs on, so profile here
+                result = instrument.profile_call(self.work, self.profile_path, self)
+            else:
+                result = self.work(self)
+        except TaskCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", e))
+        else:
+            if self.cancel_event.is_set():
+                self.messages.put(("cancelled", None))
+            else:
+                self.messages.put(("done", result))
+
+    def __poll(self):
+        """Main thread: dispatch queued messages, then poll again until the task ends"""
+        progress = None
+        outcome = None
+        while outcome is None:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress = payload  # Only the latest report needs drawing
+            else:
+                outcome = (kind, payload)
+
+        if progress is not None and self.on_progress:
+            self.on_progress(*progress)
+        if outcome is None:
+            self.root.after(self.poll_ms, self.__poll)
+            return
+
+        self.finished = True
+        kind, payload = outcome
+        if kind == "done":
+            self.on_done(payload)
+        elif kind == "error":
+            if self.on_error:
+                self.on_error(payload)
+        elif kind == "cancelled":
+            if self.on_cancel:
+                self.on_cancel()
@@ -8,8 +8,7 @@ def draw_system(selected_var, input_entry: int):
     systems = sys_module.systems
     selection = selected_var.get()
     lsys = ls.LSystem(custom_system=systems[selection])
-    instructions = lsys.generate(input_entry)
-    lsys.draw(instructions)
+    lsys.draw(lsys.iter_symbols(input_entry))
     
 def setup_turtle_screen():
     """
@@ -22,7 +21,14 @@ def setup_turtle_screen():
     win.tracer(0)
     return win
 
-def main():
+def start():
+    """
+    Open the turtle window and the control panel and draw their first frame.
+    
+    The systems catalog is loaded in the background afterwards.
+    
+    :return: (turtle screen, control panel).
+    """
     # Create necessary directories using utils
     utils.get_animations_dir()  # Ensures animations directory exists
     utils.get_examples_dir()    # Ensures examples directory exists
@@ -35,9 +41,13 @@ def main():
     root = win.getcanvas().winfo_toplevel()
     
     # Create the control panel as a class instance
-    cp.LSystemControlPanel(root)
+    panel = cp.LSystemControlPanel(root)
     
     win.update()
+    return win, panel
+
+def main():
+    win, _ = start()
     win.exitonclick()
 
 if __name__ == "__main__":
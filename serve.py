@@ -0,0 +1,5 @@
+import sys
+import lsystem.service as service
+
+if __name__ == "__main__":
+    sys.exit(service.main())
@@ -0,0 +1,5 @@
+import sys
+import lsystem.sweep as sweep
+
+if __name__ == "__main__":
+    sys.exit(sweep.main())
@@ -0,0 +1,67 @@
+"""GrowthAnalyzer must predict generate() exactly, and plan_generation must respect its budgets."""
+import collections
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import analysis, geometry, lsystem, utils  # noqa: E402
+
+EXAMPLES = sorted(glob.glob(os.path.join(utils.get_examples_dir(), "*.json")))
+ITERATIONS = range(7)
+
+
+def load(path):
+    with open(path) as file:
+        return lsystem.LSystem(custom_system=json.load(file))
+
+
+@pytest.fixture(params=EXAMPLES, ids=lambda path: os.path.splitext(os.path.basename(path))[0])
+def example(request):
+    return load(request.param)
+
+
+@pytest.mark.parametrize("iterations", ITERATIONS)
+def test_counts_match_generate(example, iterations):
+    analyzer = analysis.GrowthAnalyzer(example)
+    instructions = example.generate(iterations)
+    counts = {char: count for char, count in analyzer.symbol_counts(iterations).items() if count}
+    assert counts == collections.Counter(instructions)
+    assert analyzer.length(iterations) == len(instructions)
+
+
+@pytest.mark.parametrize("iterations", ITERATIONS)
+def test_segments_match_forward_moves(example, iterations):
+    analyzer = analysis.GrowthAnalyzer(example)
+    walker = geometry.TurtleWalker(example.lSystem)
+    kinds = walker.classify(example.generate(iterations))
+    assert analyzer.segments(iterations) == int((kinds == geometry.FORWARD).sum())
+    assert analyzer.segments(iterations) == len(geometry.compute_segments(example.lSystem, example.generate(iterations)))
+
+
+def test_memory_covers_both_generations(example):
+    analyzer = analysis.GrowthAnalyzer(example)
+    assert analyzer.memory(0) == analyzer.length(0)
+    assert analyzer.memory(5) == analyzer.length(4) + 2 * analyzer.length(5)
+
+
+def test_plan_thresholds(example):
+    analyzer = analysis.GrowthAnalyzer(example)
+    segments = analyzer.segments(5)
+    memory = analyzer.memory(5)
+
+    assert analysis.plan_generation(analyzer, 5, max_memory=memory, max_segments=segments) == analysis.GENERATE
+    assert analysis.plan_generation(analyzer, 5, max_memory=memory - 1, max_segments=segments) == analysis.STREAM
+    assert analysis.plan_generation(analyzer, 5, max_memory=memory, max_segments=segments - 1) == analysis.REFUSE
+    # The segment cap wins over the memory budget
+    assert analysis.plan_generation(analyzer, 5, max_memory=memory - 1, max_segments=segments - 1) == analysis.REFUSE
+
+
+def test_plan_defaults():
+    analyzer = analysis.GrowthAnalyzer(lsystem.LSystem(custom_system={"axiom": "F", "rules": {"F": "FF"}}))
+    assert analysis.plan_generation(analyzer, 10) == analysis.GENERATE
+    assert analysis.plan_generation(analyzer, 21) == analysis.REFUSE  # 2**21 segments
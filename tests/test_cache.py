@@ -0,0 +1,87 @@
+"""The geometry cache must hand back what was stored, and drop what it cannot trust."""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import cache, cli, geometry, lsystem, segments, utils  # noqa: E402
+
+with open(os.path.join(utils.get_examples_dir(), "koch_curve.json")) as file:
+    SYSTEM = json.load(file)
+
+
+def expected_segments(iterations):
+    lsys = lsystem.LSystem(custom_system=SYSTEM)
+    return geometry.compute_segments(lsys.lSystem, lsys.generate(iterations))
+
+
+@pytest.fixture
+def geometry_cache(tmp_path):
+    return cache.GeometryCache(str(tmp_path), min_segments=1000)
+
+
+def test_put_get_roundtrip(geometry_cache):
+    assert geometry_cache.get(SYSTEM, 4) is None
+    assert not geometry_cache.contains(SYSTEM, 4)
+    stored = geometry_cache.put(SYSTEM, 4, [expected_segments(4)])
+    assert geometry_cache.contains(SYSTEM, 4)
+    np.testing.assert_array_equal(geometry_cache.get(SYSTEM, 4, verify=True), stored)
+    np.testing.assert_allclose(stored, expected_segments(4), rtol=1e-6, atol=1e-3)
+    assert segments.read_segments(geometry_cache.path(cache.geometry_key(SYSTEM), 4)).shape == stored.shape
+    assert (geometry_cache.hits, geometry_cache.misses) == (1, 1)
+
+
+def test_drawing_settings_are_part_of_the_key(geometry_cache):
+    geometry_cache.put(SYSTEM, 3, [expected_segments(3)])
+    turned = dict(SYSTEM, settings=dict(SYSTEM["settings"], angle=SYSTEM["settings"]["angle"] + 1))
+    assert geometry_cache.get(turned, 3) is None
+
+
+def test_truncated_file_is_a_miss(geometry_cache):
+    geometry_cache.put(SYSTEM, 4, [expected_segments(4)])
+    path = geometry_cache.path(cache.geometry_key(SYSTEM), 4)
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 8)
+    assert geometry_cache.get(SYSTEM, 4) is None
+    assert not os.path.exists(path)
+    assert geometry_cache.corrupt == 1
+
+
+def test_checksum_only_on_request(geometry_cache):
+    geometry_cache.put(SYSTEM, 4, [expected_segments(4)])
+    path = geometry_cache.path(cache.geometry_key(SYSTEM), 4)
+    with open(path, "r+b") as file:
+        file.seek(segments.HEADER.size)
+        file.write(b"\xff" * 16)
+    assert geometry_cache.get(SYSTEM, 4) is not None
+    assert geometry_cache.get(SYSTEM, 4, verify=True) is None
+    assert not os.path.exists(path)
+
+
+def test_iter_chunks_stores_large_systems_only(geometry_cache):
+    small = np.concatenate(list(geometry_cache.iter_chunks(SYSTEM, 3)))
+    assert not geometry_cache.contains(SYSTEM, 3)
+    np.testing.assert_allclose(small, expected_segments(3), rtol=1e-9, atol=1e-6)
+
+    large = np.concatenate(list(geometry_cache.iter_chunks(SYSTEM, 5, chunk_size=1000)))
+    assert geometry_cache.contains(SYSTEM, 5)
+    np.testing.assert_allclose(large, expected_segments(5), rtol=1e-6, atol=1e-3)
+
+
+@pytest.mark.parametrize("fmt", ["png", "svg", "seg"])
+def test_cached_jobs_bypass_the_segment_budget(tmp_path, fmt):
+    settings = {"width": 200, "height": 150, "scale": 1.0, "fit": True, "supersample": 1,
+                "deterministic": True, "instanced": False}
+    job = {"system": SYSTEM, "path": None, "name": "koch", "iterations": 5, "format": fmt, "max_segments": 1000,
+           "duration": 500, "options": cli.format_options(fmt, settings), "cache": str(tmp_path / "cache"),
+           "output": str(tmp_path / f"koch.{fmt}")}
+    assert "over the budget" in cli.run_job(job)["error"]
+
+    cache.GeometryCache(job["cache"]).segments(SYSTEM, 5)
+    assert cli.run_job(job)["error"] is None
+    assert os.path.getsize(job["output"]) > 0
+    assert "over the budget" in cli.run_job(dict(job, cache=None))["error"]
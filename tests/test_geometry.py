@@ -0,0 +1,102 @@
+"""The vectorized turtle walk must match a symbol-by-symbol walk with draw_reference semantics."""
+import glob
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import geometry, lsystem, utils  # noqa: E402
+
+EXAMPLES = sorted(glob.glob(os.path.join(utils.get_examples_dir(), "*.json")))
+ITERATIONS = range(6)
+CHUNK_SIZES = [1, 7, 64, geometry.DEFAULT_CHUNK_SIZE]
+
+# Brackets that do not balance, within a rule and across the axiom: draw_reference ignores
+# a ']' on an empty stack and leaves unmatched '[' open
+UNBALANCED_SYSTEMS = {
+    "extra_close": {"axiom": "F]]+F", "rules": {"F": "F[+F]]F[-F"}},
+    "extra_open": {"axiom": "[[F", "rules": {"F": "F[-F[+F]F"}},
+    "close_first": {"axiom": "]F[", "rules": {"F": "]F+[F-F]]["}},
+}
+
+
+def reference_walk(lsystem_dict, instructions):
+    """Walk the turtle one symbol at a time, like LSystem.draw_reference"""
+    settings = lsystem_dict["settings"]
+    variables = lsystem_dict["variables"]
+    x, y = float(lsystem_dict["goto"]["x"]), float(lsystem_dict["goto"]["y"])
+    heading = float(settings["headingAngle"])
+    stack = []
+    segments = []
+    for char in instructions:
+        if char == variables["var1"] or char == variables["var2"]:
+            radians = math.radians(heading % 360.0)
+            end_x = x + settings["distance"] * math.cos(radians)
+            end_y = y + settings["distance"] * math.sin(radians)
+            segments.append((x, y, end_x, end_y))
+            x, y = end_x, end_y
+        elif char == "+":
+            heading -= settings["angle"]
+        elif char == "-":
+            heading += settings["angle"]
+        elif char == "|":
+            heading -= 180.0
+        elif char == "[":
+            stack.append((x, y, heading))
+            heading += settings["turnLeftStack"]
+        elif char == "]":
+            if stack:
+                x, y, heading = stack.pop()
+                heading -= settings["turnRightStack"]
+    return np.array(segments).reshape(-1, 4), (x, y, heading)
+
+
+def load(path):
+    with open(path) as file:
+        return lsystem.LSystem(custom_system=json.load(file))
+
+
+def assert_walks_match(lsys, iterations, chunk_size):
+    instructions = lsys.generate(iterations)
+    expected, (x, y, heading) = reference_walk(lsys.lSystem, instructions)
+
+    np.testing.assert_allclose(geometry.compute_segments(lsys.lSystem, instructions, chunk_size),
+                               expected, rtol=1e-9, atol=1e-6)
+
+    walker = geometry.TurtleWalker(lsys.lSystem)
+    for chunk in geometry.iter_text_chunks(instructions, chunk_size):
+        walker.walk(chunk)
+    np.testing.assert_allclose(walker.position, [x, y], rtol=1e-9, atol=1e-6)
+    # Headings may differ by whole turns
+    assert math.cos(math.radians(walker.heading - heading)) == pytest.approx(1.0)
+
+
+@pytest.fixture(params=EXAMPLES, ids=lambda path: os.path.splitext(os.path.basename(path))[0])
+def example(request):
+    return load(request.param)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("iterations", ITERATIONS)
+def test_examples_match_reference(example, iterations, chunk_size):
+    assert_walks_match(example, iterations, chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("name", UNBALANCED_SYSTEMS)
+def test_unbalanced_brackets_match_reference(name, chunk_size):
+    lsys = lsystem.LSystem(custom_system=UNBALANCED_SYSTEMS[name])
+    lsys.lSystem["settings"].update(turnLeftStack=10, turnRightStack=25)
+    for iterations in range(5):
+        assert_walks_match(lsys, iterations, chunk_size)
+
+
+def test_stream_matches_string(example):
+    instructions = example.generate(4)
+    np.testing.assert_allclose(geometry.compute_segments(example.lSystem, example.iter_chunks(4, chunk_size=5), 16),
+                               geometry.compute_segments(example.lSystem, instructions), rtol=1e-9, atol=1e-6)
@@ -0,0 +1,36 @@
+"""Animation frames must not depend on how they are spread over worker processes."""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import gif, utils  # noqa: E402
+
+with open(os.path.join(utils.get_examples_dir(), "fractal_plant.json")) as file:
+    SYSTEM = json.load(file)
+OPTIONS = {"width": 160, "height": 120, "fit": True}
+
+
+@pytest.mark.parametrize("weights, parts, expected", [
+    ([1, 4, 16, 64], 4, [(1, 1), (2, 2), (3, 3), (4, 4)]),
+    ([1, 4, 16, 64], 2, [(1, 3), (4, 4)]),
+    ([5] * 8, 3, [(1, 2), (3, 5), (6, 8)]),
+    ([1, 1], 8, [(1, 1), (2, 2)]),
+    ([3], 4, [(1, 1)]),
+])
+def test_split_iterations(weights, parts, expected):
+    assert gif.split_iterations(weights, parts) == expected
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_workers_match_single_process(monkeypatch, stream):
+    serial = [np.asarray(frame) for frame in gif.iter_frames(SYSTEM, 4, **OPTIONS)]
+    monkeypatch.setattr(gif, "PARALLEL_MIN_SEGMENTS", 0)
+    parallel = [np.asarray(frame) for frame in gif.iter_frames(SYSTEM, 4, workers=2, stream=stream, **OPTIONS)]
+    assert len(parallel) == len(serial) == 4
+    for expected, frame in zip(serial, parallel):
+        np.testing.assert_array_equal(frame, expected)
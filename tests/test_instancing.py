@@ -0,0 +1,78 @@
+"""Instanced geometry must flatten to exactly what the turtle walk draws."""
+import glob
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import geometry, instancing, lsystem, utils  # noqa: E402
+
+EXAMPLES = sorted(glob.glob(os.path.join(utils.get_examples_dir(), "*.json")))
+ITERATIONS = range(7)
+LEAF_SEGMENTS = [1, 16, instancing.DEFAULT_LEAF_SEGMENTS]
+
+# Systems InstancedGeometry refuses, which iter_system_segments walks symbol by symbol instead
+UNINSTANCEABLE_SYSTEMS = {
+    "rewrites_bracket": {"axiom": "F[+F]F", "rules": {"F": "F[-F]F", "[": "[F"}},
+    "unbalanced_open": {"axiom": "F", "rules": {"F": "F[+F"}},
+    "unbalanced_close": {"axiom": "F[F]", "rules": {"F": "F]+F["}},
+}
+
+
+def load(path):
+    with open(path) as file:
+        return lsystem.LSystem(custom_system=json.load(file))
+
+
+@pytest.fixture(params=EXAMPLES, ids=lambda path: os.path.splitext(os.path.basename(path))[0])
+def example(request):
+    return load(request.param)
+
+
+@pytest.mark.parametrize("leaf_segments", LEAF_SEGMENTS)
+@pytest.mark.parametrize("iterations", ITERATIONS)
+def test_flatten_matches_walk(example, iterations, leaf_segments):
+    instanced = instancing.InstancedGeometry(example, iterations, leaf_segments)
+    instructions = example.generate(iterations)
+    expected = geometry.compute_segments(example.lSystem, instructions)
+    assert instanced.segment_count == len(expected)
+    np.testing.assert_allclose(instanced.flatten(), expected, rtol=1e-9, atol=1e-6)
+
+    walker = geometry.TurtleWalker(example.lSystem)
+    walker.walk(instructions)
+    x, y, heading = instanced.end_pose
+    np.testing.assert_allclose([x, y], walker.position, rtol=1e-9, atol=1e-6)
+    assert math.cos(math.radians(heading - walker.heading)) == pytest.approx(1.0)
+
+
+def test_iter_segments_chunks(example):
+    instanced = instancing.InstancedGeometry(example, 5, leaf_segments=4)
+    chunks = list(instanced.iter_segments(chunk_size=32))
+    assert all(len(chunk) for chunk in chunks)
+    np.testing.assert_array_equal(np.concatenate(chunks), instanced.flatten())
+
+
+@pytest.mark.parametrize("name, message", [
+    ("rewrites_bracket", "rewrite the bracket"),
+    ("unbalanced_open", "unbalanced brackets"),
+    ("unbalanced_close", "unbalanced brackets"),
+])
+def test_uninstanceable_systems_raise(name, message):
+    lsys = lsystem.LSystem(custom_system=UNINSTANCEABLE_SYSTEMS[name])
+    with pytest.raises(ValueError, match=message):
+        instancing.InstancedGeometry(lsys, 3)
+
+
+@pytest.mark.parametrize("name", UNINSTANCEABLE_SYSTEMS)
+def test_iter_system_segments_falls_back(name):
+    lsys = lsystem.LSystem(custom_system=UNINSTANCEABLE_SYSTEMS[name])
+    for iterations in range(5):
+        chunks = list(instancing.iter_system_segments(lsys, iterations, chunk_size=8))
+        segments = np.concatenate(chunks) if chunks else np.empty((0, 4))
+        np.testing.assert_allclose(segments, geometry.compute_segments(lsys.lSystem, lsys.generate(iterations)),
+                                   rtol=1e-9, atol=1e-6)
@@ -0,0 +1,62 @@
+"""The bulk rewriting engine must match the per-character regex reference path."""
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import lsystem, utils  # noqa: E402
+
+EXAMPLES = sorted(glob.glob(os.path.join(utils.get_examples_dir(), "*.json")))
+ITERATIONS = range(7)
+
+# Systems the byte engine cannot handle, which take the str.translate path instead:
+# a symbol outside latin-1, and an alphabet leaving fewer free bytes than rewritten symbols
+FALLBACK_SYSTEMS = {
+    "non_latin1": {"axiom": "A", "rules": {"A": "A☃[+B]", "B": "F-A", "☃": "F☃"}},
+    "crowded_alphabet": {"axiom": "".join(map(chr, range(0x20, 0x100))),
+                         "rules": {chr(code): chr(code + 1) + "F" for code in range(0x20, 0xFF)}},
+}
+
+
+def load(path):
+    with open(path) as file:
+        return lsystem.LSystem(custom_system=json.load(file))
+
+
+@pytest.fixture(params=EXAMPLES, ids=lambda path: os.path.splitext(os.path.basename(path))[0])
+def example(request):
+    return load(request.param)
+
+
+def test_examples_found():
+    assert EXAMPLES
+
+
+@pytest.mark.parametrize("iterations", ITERATIONS)
+def test_generate_matches_reference(example, iterations):
+    assert example.generate(iterations) == example.generate_reference(iterations)
+
+
+def test_iter_generations_matches_reference(example):
+    generations = list(example.iter_generations(max(ITERATIONS)))
+    assert generations == [(i, example.generate_reference(i)) for i in ITERATIONS]
+
+
+@pytest.mark.parametrize("iterations", ITERATIONS)
+def test_iter_chunks_matches_reference(example, iterations):
+    assert "".join(example.iter_chunks(iterations, chunk_size=7)) == example.generate_reference(iterations)
+
+
+@pytest.mark.parametrize("name", FALLBACK_SYSTEMS)
+def test_fallback_systems_match_reference(name):
+    lsys = lsystem.LSystem(custom_system=FALLBACK_SYSTEMS[name])
+    for iterations in range(4):
+        expected = lsys.generate_reference(iterations)
+        assert lsys.generate(iterations) == expected
+        assert lsys.rewrite(lsys.generate(1), iterations) == lsys.generate_reference(iterations + 1)
+        assert "".join(lsys.iter_chunks(iterations, chunk_size=7)) == expected
+    assert list(lsys.iter_generations(3)) == [(i, lsys.generate_reference(i)) for i in range(4)]
@@ -0,0 +1,22 @@
+"""Preview stats must match a plain count of the generated string."""
+import collections
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import preview  # noqa: E402
+
+
+@pytest.mark.parametrize("instructions", ["", "F", "F[+F]F[-F]F" * 50, "FF]]][[+G", "A☃[+B]ÿ\x00", "".join(map(chr, range(256)))])
+def test_symbol_counts_match_counter(instructions):
+    counts = preview.symbol_counts(instructions)
+    assert counts == dict(collections.Counter(instructions))
+    assert list(counts) == sorted(counts)
+
+
+def test_stats():
+    stats = preview.InstructionPreview("F[+F[-F]]]F").stats()
+    assert stats == {"length": 11, "counts": {"+": 1, "-": 1, "F": 4, "[": 2, "]": 3}, "max_depth": 2}
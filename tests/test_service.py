@@ -0,0 +1,97 @@
+"""End-to-end checks of the render service over a localhost socket."""
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import service, utils  # noqa: E402
+
+with open(os.path.join(utils.get_examples_dir(), "fractal_plant.json")) as file:
+    SYSTEM = json.load(file)
+
+REQUEST = {"system": SYSTEM, "iterations": 5, "format": "png", "options": {"width": 200, "height": 150, "fit": True}}
+
+
+async def http(address, method, path, body=None):
+    """Send one request and return (status, lower-cased headers, body)"""
+    reader, writer = await asyncio.open_connection(*address)
+    data = body if isinstance(body, bytes) else json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                 + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict((name.lower(), value.strip()) for name, value in (line.split(":", 1) for line in lines[1:]))
+    assert int(headers["content-length"]) == len(payload)
+    return int(lines[0].split()[1]), headers, payload
+
+
+def run_with_service(scenario, **settings):
+    """Serve on a free localhost port, run scenario(address) against it and shut down"""
+    async def main():
+        render_service = service.RenderService(**dict({"workers": 1}, **settings))
+        ready = asyncio.get_running_loop().create_future()
+        server = asyncio.create_task(service.serve(render_service, "127.0.0.1", 0, ready=ready.set_result))
+        try:
+            return await scenario(await asyncio.wait_for(ready, 10))
+        finally:
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+def test_identical_requests_are_coalesced():
+    async def scenario(address):
+        responses = await asyncio.gather(*(http(address, "POST", "/render", REQUEST) for _ in range(6)))
+        _, _, metrics = await http(address, "GET", "/metrics")
+        return responses, json.loads(metrics)
+
+    responses, metrics = run_with_service(scenario)
+    assert [status for status, _, _ in responses] == [200] * 6
+    assert all(headers["content-type"] == "image/png" for _, headers, _ in responses)
+    assert len({payload for _, _, payload in responses}) == 1
+    assert sorted(headers["x-coalesced"] for _, headers, _ in responses) == ["false"] + ["true"] * 5
+    assert (metrics["jobs"], metrics["coalesced"], metrics["completed"]) == (1, 5, 1)
+
+
+def test_errors():
+    async def scenario(address):
+        return {
+            "bad_json": await http(address, "POST", "/render", b"{not json"),
+            "bad_system": await http(address, "POST", "/render", {"system": 1}),
+            "bad_option": await http(address, "POST", "/render", dict(REQUEST, options={"bogus": 1})),
+            "over_budget": await http(address, "POST", "/render", dict(REQUEST, iterations=30)),
+            "not_found": await http(address, "GET", "/nope"),
+            "wrong_method": await http(address, "GET", "/render"),
+        }
+
+    responses = run_with_service(scenario)
+    statuses = {name: status for name, (status, _, _) in responses.items()}
+    assert statuses == {"bad_json": 400, "bad_system": 400, "bad_option": 400, "over_budget": 422,
+                        "not_found": 404, "wrong_method": 405}
+    for name in ("bad_json", "bad_system", "bad_option", "over_budget"):
+        assert "error" in json.loads(responses[name][2])
+    assert "over the budget" in json.loads(responses["over_budget"][2])["error"]
+
+
+def test_health_and_metrics():
+    async def scenario(address):
+        health = await http(address, "GET", "/health")
+        await http(address, "POST", "/render", dict(REQUEST, format="svg"))
+        metrics = await http(address, "GET", "/metrics")
+        return health, metrics
+
+    (health_status, _, health), (metrics_status, headers, metrics) = run_with_service(scenario)
+    assert (health_status, health.strip()) == (200, b"ok")
+    assert metrics_status == 200 and headers["content-type"].startswith("application/json")
+    metrics = json.loads(metrics)
+    assert (metrics["requests"], metrics["jobs"], metrics["completed"], metrics["failed"]) == (1, 1, 1, 0)
+    assert (metrics["queue_depth"], metrics["running"], metrics["in_flight"]) == (0, 0, 0)
+    for latency in ("queue_wait", "render", "request"):
+        assert set(metrics[latency]) == {"p50", "p95", "max"}
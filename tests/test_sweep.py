@@ -0,0 +1,43 @@
+"""Sweep batching must cover every variant once and not change the thumbnails."""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lsystem import sweep, utils  # noqa: E402
+
+with open(os.path.join(utils.get_examples_dir(), "fractal_plant.json")) as file:
+    SYSTEM = json.load(file)
+
+
+@pytest.mark.parametrize("specs, workers, expected", [
+    (["angle=15:35:5"], 1, 1),
+    (["angle=15:35:5"], 4, 4),
+    (["angle=15:35:5"], 8, 5),
+    (["angle=15:35:5", "iterations=2:5"], 4, 6),
+])
+def test_split_batches(specs, workers, expected):
+    variants = sweep.build_variants(sweep.parse_parameters(specs), 4)
+    batches = sweep.split_batches(SYSTEM, variants, workers)
+    assert len(batches) == expected
+    assert sorted(index for batch in batches for index, _ in batch) == list(range(len(variants)))
+    for batch in batches:
+        assert len({variant["iterations"] for _, variant in batch}) == 1
+
+
+def test_workers_match_serial():
+    variants = sweep.build_variants(sweep.parse_parameters(["angle=15:35:10"]), 3)
+    serial = sweep.render_sweep(SYSTEM, variants, workers=1, thumbnail=64)
+    parallel = sweep.render_sweep(SYSTEM, variants, workers=2, thumbnail=64)
+    for expected, image in zip(serial, parallel):
+        np.testing.assert_array_equal(np.asarray(image), np.asarray(expected))
+
+
+def test_budget_refused():
+    variants = sweep.build_variants(sweep.parse_parameters(["iterations=3,12"]), 4)
+    with pytest.raises(ValueError):
+        sweep.render_sweep(SYSTEM, variants, max_segments=10_000)